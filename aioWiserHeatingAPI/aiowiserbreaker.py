@@ -0,0 +1,119 @@
+"""
+# Wiser Circuit Breaker
+
+Stops requests to a Wiser Hub that is known to be down.  After a number of failed
+requests in a row the breaker opens and requests fail straight away instead of each
+waiting for the hub timeout.  While open, the hub is probed in the background with
+an increasing delay, and the breaker closes again as soon as a probe succeeds.
+"""
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3
+PROBE_INTERVAL = 5
+MAX_PROBE_INTERVAL = 120
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+
+
+class wiserCircuitBreaker:
+    """
+    Circuit breaker for the requests to a single hub
+    """
+
+    def __init__(
+        self,
+        failure_threshold=FAILURE_THRESHOLD,
+        probe_interval=PROBE_INTERVAL,
+        max_probe_interval=MAX_PROBE_INTERVAL,
+    ):
+        """
+        param failure_threshold: Failed requests in a row that open the breaker, 0 to never open
+        param probe_interval: Seconds before the first probe of an open breaker, doubling
+            after each failed probe
+        param max_probe_interval: Longest wait between probes
+        """
+        self._failureThreshold = failure_threshold
+        self._probeInterval = probe_interval
+        self._maxProbeInterval = max_probe_interval
+        self._failures = 0
+        self._openedAt = None
+        self._probeTask = None
+
+    @property
+    def state(self):
+        return BREAKER_CLOSED if self._openedAt is None else BREAKER_OPEN
+
+    @property
+    def failures(self):
+        """Number of failed requests in a row"""
+        return self._failures
+
+    @property
+    def openedAt(self):
+        """time.time() the breaker opened, or None if closed"""
+        return self._openedAt
+
+    def allow(self):
+        """
+        Checks if a request should be sent
+        return: Boolean, False while the breaker is open
+        """
+        return self._openedAt is None
+
+    def recordSuccess(self):
+        if self._openedAt is not None:
+            _LOGGER.debug("Wiser Hub reachable again, closing circuit breaker")
+        self._failures = 0
+        self._openedAt = None
+
+    def recordFailure(self, probe=None):
+        """
+        Records a failed request, opening the breaker once the threshold is reached
+        param probe: Coroutine function that sends one request to the hub and raises if it
+            fails.  Run in the background while the breaker is open.
+        """
+        self._failures += 1
+        if (
+            self._openedAt is None
+            and self._failureThreshold
+            and self._failures >= self._failureThreshold
+        ):
+            _LOGGER.debug(
+                "Wiser Hub failed {} requests in a row, opening circuit breaker".format(self._failures)
+            )
+            self._openedAt = time.time()
+            if probe is not None and (self._probeTask is None or self._probeTask.done()):
+                self._probeTask = asyncio.ensure_future(self._probe(probe))
+
+    async def _probe(self, probe):
+        delay = self._probeInterval
+        while self._openedAt is not None:
+            await asyncio.sleep(delay)
+            if self._openedAt is None:
+                return
+            try:
+                await probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                _LOGGER.debug("Wiser Hub probe failed.  Error {}".format(ex))
+                delay = min(delay * 2, self._maxProbeInterval)
+            else:
+                self.recordSuccess()
+
+    def reset(self):
+        """Closes the breaker and stops any background probe"""
+        self.stop()
+        self._failures = 0
+        self._openedAt = None
+
+    def stop(self):
+        """Stops any background probe"""
+        if self._probeTask is not None:
+            self._probeTask.cancel()
+            self._probeTask = None
@@ -0,0 +1,133 @@
+"""
+# Wiser Snapshot Cache
+
+Keeps the last hub data on disk as gzip compressed json so a restarted wiserHub has
+data to serve straight away, before its first refresh completes.  Files are written
+to a temporary file and renamed over the old one, so a crash mid write never leaves
+a half written cache behind.  Data is encoded and compressed in an executor thread so
+the event loop is not held up, and is only written when it has changed.
+"""
+import aiofiles
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+CACHE_WRITE_INTERVAL = 300
+# Fastest gzip level, the cache is small next to the time spent compressing it
+CACHE_COMPRESS_LEVEL = 1
+
+
+class wiserSnapshotCache:
+    """
+    On disk copy of a hub's domain and network data
+    """
+
+    def __init__(self, path, host, write_interval=CACHE_WRITE_INTERVAL):
+        """
+        param path: Cache file path
+        param host: Hub host, a cache written for another host is ignored
+        param write_interval: Min seconds between writes, 0 to write after every refresh
+        """
+        self._path = path
+        self._host = host
+        self._writeInterval = write_interval
+        self._lastWrite = None
+        # Data last written.  Snapshots share the data objects of unchanged refreshes so
+        # the same objects mean the same data.
+        self._savedSections = None
+        self._savedNetwork = None
+
+    @property
+    def path(self):
+        return self._path
+
+    def load(self):
+        """
+        Reads the cache.  Synchronous so a hub can load it in its constructor.
+        return: Dict with timestamp, sections and network, or None if there is no usable cache
+        """
+        try:
+            with gzip.open(self._path, "rb") as f:
+                data = json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as ex:
+            _LOGGER.debug("Unable to read Wiser Hub cache {}.  Error {}".format(self._path, ex))
+            return None
+        if not isinstance(data, dict) or data.get("format") != CACHE_FORMAT:
+            _LOGGER.debug("Ignoring Wiser Hub cache {} in an unknown format".format(self._path))
+            return None
+        if data.get("host") != self._host:
+            _LOGGER.debug(
+                "Ignoring Wiser Hub cache {} written for hub {}".format(self._path, data.get("host"))
+            )
+            return None
+        return data
+
+    def isDue(self, snapshot, force=False):
+        """
+        Checks if a snapshot has data that has changed since the last write and the write
+        interval has passed
+        param snapshot: wiserSnapshot
+        param force: Ignore the write interval
+        return: Boolean
+        """
+        # Nothing has been refreshed since the cache was loaded
+        if not snapshot.sections or snapshot.staleSections.issuperset(snapshot.sections):
+            return False
+        if snapshot.sections is self._savedSections and snapshot.network is self._savedNetwork:
+            return False
+        return (
+            force
+            or self._lastWrite is None
+            or time.monotonic() - self._lastWrite >= self._writeInterval
+        )
+
+    async def save(self, snapshot):
+        """
+        Writes a snapshot's data to the cache file
+        param snapshot: wiserSnapshot
+        """
+        payload = await asyncio.get_running_loop().run_in_executor(None, self._encode, snapshot)
+        tempPath = "{}.{}.tmp".format(self._path, os.getpid())
+        try:
+            async with aiofiles.open(tempPath, "wb") as f:
+                await f.write(payload)
+            os.replace(tempPath, self._path)
+        except OSError:
+            try:
+                os.remove(tempPath)
+            except OSError:
+                pass
+            raise
+        self._lastWrite = time.monotonic()
+        self._savedSections = snapshot.sections
+        self._savedNetwork = snapshot.network
+        _LOGGER.debug("Wrote Wiser Hub cache {}, {} bytes".format(self._path, len(payload)))
+
+    def _encode(self, snapshot):
+        """
+        Encodes and compresses a snapshot's data.  Run in an executor, which is safe as
+        snapshot data is never changed once built.
+        param snapshot: wiserSnapshot
+        return: Bytes
+        """
+        return gzip.compress(
+            json.dumps(
+                {
+                    "format": CACHE_FORMAT,
+                    "host": self._host,
+                    "timestamp": snapshot.timestamp,
+                    "sections": snapshot.sections,
+                    "network": snapshot.network,
+                },
+                separators=(",", ":"),
+            ).encode(),
+            compresslevel=CACHE_COMPRESS_LEVEL,
+        )
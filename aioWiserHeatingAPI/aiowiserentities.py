@@ -0,0 +1,193 @@
+"""
+# Wiser Entities
+
+Compact typed views of the hub's rooms, devices, smart valves, roomstats, smart plugs
+and heating channels.  They use __slots__ so they hold no per instance dict, and
+temperatures are already converted from the hub's tenths of a degree.
+"""
+
+
+class wiserEntity:
+    """
+    Base class for entities built from a hub json dict
+    """
+
+    __slots__ = ()
+    # Tuples of (attribute, hub key or tuple of nested keys, value is in tenths)
+    _FIELDS = ()
+
+    def __init__(self, data, fromWiserTemp):
+        """
+        param data: The entity dict from the hub
+        param fromWiserTemp: Function converting hub tenths to decimal values
+        """
+        for attribute, key, tenths in self._FIELDS:
+            if isinstance(key, tuple):
+                value = data
+                for part in key:
+                    value = value.get(part) if isinstance(value, dict) else None
+            else:
+                value = data.get(key)
+            if tenths and value is not None:
+                value = fromWiserTemp(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            setattr(self, attribute, value)
+
+    def asDict(self):
+        return {attribute: getattr(self, attribute) for attribute, _, _ in self._FIELDS}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.asDict() == other.asDict()
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(key, value) for key, value in self.asDict().items()),
+        )
+
+
+class wiserRoom(wiserEntity):
+    __slots__ = (
+        "id",
+        "name",
+        "mode",
+        "temperature",
+        "setPoint",
+        "currentSetPoint",
+        "scheduledSetPoint",
+        "percentageDemand",
+        "setpointOrigin",
+        "windowState",
+        "controlOutputState",
+        "scheduleId",
+        "roomStatId",
+        "smartValveIds",
+    )
+    _FIELDS = (
+        ("id", "id", False),
+        ("name", "Name", False),
+        ("mode", "Mode", False),
+        ("temperature", "CalculatedTemperature", True),
+        ("setPoint", "DisplayedSetPoint", True),
+        ("currentSetPoint", "CurrentSetPoint", True),
+        ("scheduledSetPoint", "ScheduledSetPoint", True),
+        ("percentageDemand", "PercentageDemand", False),
+        ("setpointOrigin", "SetpointOrigin", False),
+        ("windowState", "WindowState", False),
+        ("controlOutputState", "ControlOutputState", False),
+        ("scheduleId", "ScheduleId", False),
+        ("roomStatId", "RoomStatId", False),
+        ("smartValveIds", "SmartValveIds", False),
+    )
+
+
+class wiserDevice(wiserEntity):
+    __slots__ = (
+        "id",
+        "nodeId",
+        "parentNodeId",
+        "productType",
+        "modelIdentifier",
+        "serialNumber",
+        "firmwareVersion",
+        "signalStrength",
+        "rssi",
+        "lqi",
+        "batteryVoltage",
+        "batteryLevel",
+    )
+    _FIELDS = (
+        ("id", "id", False),
+        ("nodeId", "NodeId", False),
+        ("parentNodeId", "ParentNodeId", False),
+        ("productType", "ProductType", False),
+        ("modelIdentifier", "ModelIdentifier", False),
+        ("serialNumber", "SerialNumber", False),
+        ("firmwareVersion", "ActiveFirmwareVersion", False),
+        ("signalStrength", "DisplayedSignalStrength", False),
+        ("rssi", ("ReceptionOfDevice", "Rssi"), False),
+        ("lqi", ("ReceptionOfDevice", "Lqi"), False),
+        ("batteryVoltage", "BatteryVoltage", True),
+        ("batteryLevel", "BatteryLevel", False),
+    )
+
+
+class wiserSmartValve(wiserEntity):
+    __slots__ = (
+        "id",
+        "temperature",
+        "setPoint",
+        "percentageDemand",
+        "setpointOrigin",
+        "windowState",
+    )
+    _FIELDS = (
+        ("id", "id", False),
+        ("temperature", "MeasuredTemperature", True),
+        ("setPoint", "SetPoint", True),
+        ("percentageDemand", "PercentageDemand", False),
+        ("setpointOrigin", "SetpointOrigin", False),
+        ("windowState", "WindowState", False),
+    )
+
+
+class wiserRoomStat(wiserEntity):
+    __slots__ = ("id", "temperature", "setPoint", "humidity")
+    _FIELDS = (
+        ("id", "id", False),
+        ("temperature", "MeasuredTemperature", True),
+        ("setPoint", "SetPoint", True),
+        ("humidity", "MeasuredHumidity", False),
+    )
+
+
+class wiserSmartPlug(wiserEntity):
+    __slots__ = (
+        "id",
+        "name",
+        "mode",
+        "outputState",
+        "manualState",
+        "scheduledState",
+        "scheduleId",
+    )
+    _FIELDS = (
+        ("id", "id", False),
+        ("name", "Name", False),
+        ("mode", "Mode", False),
+        ("outputState", "OutputState", False),
+        ("manualState", "ManualState", False),
+        ("scheduledState", "ScheduledState", False),
+        ("scheduleId", "ScheduleId", False),
+    )
+
+
+class wiserHeatingChannel(wiserEntity):
+    __slots__ = (
+        "id",
+        "name",
+        "roomIds",
+        "percentageDemand",
+        "demandOnOffOutput",
+        "heatingRelayState",
+    )
+    _FIELDS = (
+        ("id", "id", False),
+        ("name", "Name", False),
+        ("roomIds", "RoomIds", False),
+        ("percentageDemand", "PercentageDemand", False),
+        ("demandOnOffOutput", "DemandOnOffOutput", False),
+        ("heatingRelayState", "HeatingRelayState", False),
+    )
+
+
+# Entity class for each domain section
+ENTITY_CLASSES = {
+    "Device": wiserDevice,
+    "HeatingChannel": wiserHeatingChannel,
+    "Room": wiserRoom,
+    "RoomStat": wiserRoomStat,
+    "SmartPlug": wiserSmartPlug,
+    "SmartValve": wiserSmartValve,
+}
@@ -0,0 +1,207 @@
+"""
+# Wiser History
+
+Fixed size ring buffers of room temperatures, set points, demand and heating relay
+state, recorded from each hub refresh.  Values are held in NumPy arrays when NumPy is
+installed, otherwise in array module arrays, so memory stays bounded by capacity no
+matter how long the hub runs.
+"""
+import array
+import logging
+import math
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_LOGGER = logging.getLogger(__name__)
+
+HISTORY_CAPACITY = 10080
+
+# Metrics recorded from each snapshot as (entity type, metric, hub field, value is in tenths)
+HISTORY_METRICS = [
+    ("Room", "temperature", "CalculatedTemperature", True),
+    ("Room", "setPoint", "DisplayedSetPoint", True),
+    ("Room", "demand", "PercentageDemand", False),
+    ("SmartValve", "demand", "PercentageDemand", False),
+    ("HeatingChannel", "demand", "PercentageDemand", False),
+    ("HeatingChannel", "relayState", "HeatingRelayState", False),
+]
+
+NAN = float("nan")
+
+
+def _toNumber(value, tenths):
+    """Converts a hub value to a float, with On/Off states as 1 and 0"""
+    if value is None:
+        return NAN
+    if isinstance(value, str):
+        return 1.0 if value.lower() == "on" else 0.0
+    if tenths:
+        return value / 10
+    return float(value)
+
+
+class wiserHistory:
+    """
+    Ring buffer history of numeric hub values keyed by (entity type, entity id, metric).
+    All series share one ring of sample times, with NaN where an entity had no value.
+    Memory is about capacity x 4 bytes per series plus capacity x 8 bytes for the times.
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY, metrics=HISTORY_METRICS):
+        """
+        param capacity: Number of samples kept for each series
+        param metrics: List of (entity type, metric, hub field, value is in tenths)
+        """
+        self._capacity = capacity
+        self._metrics = metrics
+        self._times = self._newArray("d")
+        self._series = {}
+        self._lastSeen = {}
+        self._count = 0
+
+    def _newArray(self, typecode):
+        if numpy is not None:
+            return numpy.full(self._capacity, NAN, dtype=numpy.float64 if typecode == "d" else numpy.float32)
+        return array.array(typecode, [NAN]) * self._capacity
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def count(self):
+        """Number of samples recorded, including those overwritten"""
+        return self._count
+
+    @property
+    def keys(self):
+        """Series keys as (entity type, entity id, metric) tuples"""
+        return list(self._series)
+
+    def attach(self, hub):
+        """
+        Records every refresh of a hub
+        param hub: wiserHub
+        return: Function that detaches the history from the hub
+        """
+        return hub.addRefreshListener(self.record)
+
+    def record(self, snapshot, timestamp=None):
+        """
+        Records one sample of every metric from a snapshot
+        param snapshot: wiserSnapshot
+        param timestamp: Sample time, defaults to the snapshot time
+        """
+        slot = self._count % self._capacity
+        self._times[slot] = timestamp or snapshot.timestamp or time.time()
+        seen = set()
+        for entityType, metric, field, tenths in self._metrics:
+            for entityId, entity in snapshot.indexes.get(entityType, {}).items():
+                key = (entityType, entityId, metric)
+                values = self._series.get(key)
+                if values is None:
+                    values = self._series[key] = self._newArray("f")
+                values[slot] = _toNumber(entity.get(field), tenths)
+                self._lastSeen[key] = self._count
+                seen.add(key)
+
+        for key in list(self._series):
+            if key in seen:
+                continue
+            if self._count - self._lastSeen[key] >= self._capacity:
+                # Entity gone for a full ring so nothing left worth keeping
+                del self._series[key]
+                del self._lastSeen[key]
+            else:
+                self._series[key][slot] = NAN
+        self._count += 1
+
+    def _ordered(self, values):
+        """Returns a ring in oldest to newest order"""
+        if self._count < self._capacity:
+            return values[: self._count]
+        slot = self._count % self._capacity
+        if numpy is not None:
+            return numpy.concatenate((values[slot:], values[:slot]))
+        return values[slot:] + values[:slot]
+
+    def series(self, entityType, entityId, metric, start=None, end=None):
+        """
+        Gets the recorded samples of one series, oldest first, skipping missing values
+        param entityType: Room, SmartValve or HeatingChannel
+        param entityId: The entity id
+        param metric: temperature, setPoint, demand or relayState
+        param start: Only samples at or after this time
+        param end: Only samples at or before this time
+        return: Tuple of (times, values) as NumPy arrays, or lists without NumPy
+        """
+        values = self._series.get((entityType, entityId, metric))
+        if values is None:
+            return ([], []) if numpy is None else (numpy.empty(0), numpy.empty(0, dtype=numpy.float32))
+        times = self._ordered(self._times)
+        values = self._ordered(values)
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        if numpy is not None:
+            mask = (times >= start) & (times <= end) & ~numpy.isnan(values)
+            return times[mask], values[mask]
+        selected = [
+            (sampleTime, value)
+            for sampleTime, value in zip(times, values)
+            if start <= sampleTime <= end and not math.isnan(value)
+        ]
+        return [sample[0] for sample in selected], [sample[1] for sample in selected]
+
+    def stats(self, entityType, entityId, metric, start=None, end=None):
+        """
+        Gets the min, max and mean of a series over a time window
+        return: Dict with min, max, mean and count, values are None if there are no samples
+        """
+        _, values = self.series(entityType, entityId, metric, start, end)
+        if len(values) == 0:
+            return {"min": None, "max": None, "mean": None, "count": 0}
+        if numpy is not None:
+            return {
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "mean": float(values.mean(dtype=numpy.float64)),
+                "count": len(values),
+            }
+        return {
+            "min": min(values),
+            "max": max(values),
+            "mean": sum(values) / len(values),
+            "count": len(values),
+        }
+
+    def downsample(self, entityType, entityId, metric, interval, start=None, end=None):
+        """
+        Averages a series into fixed time buckets
+        param interval: Bucket size in seconds
+        return: Tuple of (bucket start times, bucket means) for buckets with samples
+        """
+        times, values = self.series(entityType, entityId, metric, start, end)
+        if len(values) == 0:
+            return times, values
+        origin = times[0] if start is None else start
+        if numpy is not None:
+            buckets = ((times - origin) // interval).astype(numpy.int64)
+            sums = numpy.bincount(buckets, weights=values)
+            counts = numpy.bincount(buckets)
+            used = counts > 0
+            bucketTimes = origin + numpy.nonzero(used)[0] * interval
+            return bucketTimes, (sums[used] / counts[used]).astype(numpy.float32)
+        sums = {}
+        for sampleTime, value in zip(times, values):
+            bucket = int((sampleTime - origin) // interval)
+            total, count = sums.get(bucket, (0.0, 0))
+            sums[bucket] = (total + value, count + 1)
+        buckets = sorted(sums)
+        return (
+            [origin + bucket * interval for bucket in buckets],
+            [sums[bucket][0] / sums[bucket][1] for bucket in buckets],
+        )
@@ -12,17 +12,59 @@ This API Facade allows you to communicate with your wiserhub. This API is used b
 import aiohttp
 import aiofiles
 import asyncio
+import glob
+import hashlib
 import json
 import logging
 import os
+import time
+from collections import namedtuple
+
+from .aiowiserbreaker import wiserCircuitBreaker, FAILURE_THRESHOLD, PROBE_INTERVAL
+from .aiowisercache import wiserSnapshotCache, CACHE_WRITE_INTERVAL
+from .aiowiserentities import ENTITY_CLASSES
+from .aiowiserschedule import wiserScheduleIndex, validateSchedule, writableSchedule, fromV2Schedules
+from .aiowiserstats import wiserHubStats, REFRESH_PHASES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 _LOGGER = logging.getLogger(__name__)
 
+# Fastest installed json decoder, all accept the raw response bytes
+if orjson is not None:
+    DEFAULT_JSON_DECODER = orjson.loads
+elif ujson is not None:
+    DEFAULT_JSON_DECODER = ujson.loads
+else:
+    DEFAULT_JSON_DECODER = json.loads
+
 HOMEAWAY = ["HOME", "AWAY"]
 TEMP_MINIMUM = 5
 TEMP_MAXIMUM = 30
 TEMP_OFF = -20
 TIMEOUT = 10
+CONNECTION_LIMIT = 2
+KEEPALIVE_TIMEOUT = 60
+WRITE_COALESCE_WINDOW = 0.1
+# Writes in flight to a hub at once, matching the connections to the hub
+WRITE_CONCURRENCY = CONNECTION_LIMIT
+SCHEDULE_FILE_PATTERN = "*.json"
+ROOM_MODES = ["auto", "boost", "manual", "off"]
+GET_RETRIES = 2
+RETRY_DELAY = 0.5
+# Failures that mean the hub may be down, counted by the circuit breaker.  Any other
+# error means the hub answered, such as APIError for a request it rejected.
+TRANSIENT_ERRORS = ["ConnectionError", "TimeoutError", "ServerError"]
+# Transient failures GETs are retried after.  A timeout has already waited TIMEOUT so
+# is not retried, keeping a request to a dead hub to one timeout.
+RETRY_ERRORS = ["ConnectionError", "ServerError"]
 
 WISERHUBURL = "http://{}/data/"
 #Api paths
@@ -36,6 +78,57 @@ WISERSYSTEM = "System/{}"
 WISERV2SCHEDULE = "schedules/{}"
 WISERV2API = "v2/"
 
+# Sections of the domain payload held by the hub and the key used for network data
+DOMAIN_SECTIONS = [
+    "Cloud",
+    "Device",
+    "DeviceCapabilityMatrix",
+    "HeatingChannel",
+    "HotWater",
+    "Room",
+    "RoomStat",
+    "Schedule",
+    "SmartPlug",
+    "SmartValve",
+    "System",
+]
+NETWORK_SECTION = "network"
+# Domain sections that are lists of entities with ids
+INDEXED_SECTIONS = [
+    "Device",
+    "HeatingChannel",
+    "HotWater",
+    "Room",
+    "RoomStat",
+    "Schedule",
+    "SmartPlug",
+    "SmartValve",
+]
+
+# Refresh policy of section to seconds between fetches. Sections not listed are
+# fetched on every poll.  The default refetches everything on every poll.  When more
+# sections are due than the hub has connections the whole domain is fetched in one
+# request instead, but only the due sections are taken from it, so sections that are
+# not due are not indexed, compared or rebuilt until their time comes.
+DEFAULT_REFRESH_POLICY = {}
+TIERED_REFRESH_POLICY = {
+    NETWORK_SECTION: 300,
+    "Cloud": 3600,
+    "Device": 300,
+    "DeviceCapabilityMatrix": 3600,
+    "Schedule": 600,
+}
+# Default seconds between schedule fetches with the v2 schedules api
+V2_SCHEDULE_REFRESH = 600
+
+
+
+# A change to one hub entity between refreshes.  changeType is added, removed or changed
+# and fields maps each changed field name to an (oldValue, newValue) tuple
+wiserChange = namedtuple("wiserChange", ["entityType", "entityId", "changeType", "fields"])
+CHANGE_ADDED = "added"
+CHANGE_CHANGED = "changed"
+CHANGE_REMOVED = "removed"
 
 
 class WiserException(Exception):
@@ -50,14 +143,208 @@ class WiserHubException(WiserException):
     pass
 
 
+class wiserSnapshot:
+    """
+    Immutable, versioned view of the hub data from one refresh.  Each refresh builds a
+    new snapshot and swaps it in, so a reader holding a snapshot sees consistent data
+    without locking.  The hub json inside is shared between snapshots and must not be
+    modified.
+    """
+
+    __slots__ = (
+        "version",
+        "timestamp",
+        "sections",
+        "network",
+        "indexes",
+        "device2roomMap",
+        "nodeMap",
+        "entities",
+        "scheduleIndex",
+        "changes",
+        "staleSections",
+        "unchanged",
+    )
+
+    def __init__(
+        self,
+        version=0,
+        timestamp=None,
+        sections=None,
+        network=None,
+        indexes=None,
+        device2roomMap=None,
+        nodeMap=None,
+        entities=None,
+        scheduleIndex=None,
+        changes=None,
+        staleSections=None,
+        unchanged=False,
+    ):
+        """
+        param version: Increases by one for each snapshot from a hub
+        param timestamp: Time the snapshot was made, from time.time()
+        param sections: Dict of domain section to hub json
+        param network: Network json
+        param indexes: Dict of domain section to an id to entity dict
+        param device2roomMap: Dict of device id to room
+        param nodeMap: Dict of zigbee node id to relay node
+        param entities: Dict of domain section to an id to typed entity dict
+        param scheduleIndex: wiserScheduleIndex of the compiled schedules
+        param changes: List of wiserChange from the previous snapshot
+        param staleSections: Domain sections, and network, loaded from a cache and not
+            yet refreshed
+        param unchanged: True if the hub returned exactly the same data as for the previous
+            snapshot, so everything built from it is reused and work on it can be skipped
+        """
+        for name, value in (
+            ("version", version),
+            ("timestamp", timestamp),
+            ("sections", sections or {}),
+            ("network", network or {}),
+            ("indexes", indexes or {}),
+            ("device2roomMap", device2roomMap or {}),
+            ("nodeMap", nodeMap or {}),
+            ("entities", entities or {}),
+            ("scheduleIndex", scheduleIndex or wiserScheduleIndex()),
+            ("changes", changes or []),
+            ("staleSections", frozenset(staleSections or ())),
+            ("unchanged", unchanged),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("wiserSnapshot is read only")
+
+    @property
+    def stale(self):
+        """True while any of the data is from a cache and not yet refreshed"""
+        return bool(self.staleSections)
+
+    def refreshed(self, version, timestamp):
+        """
+        Gets a copy of this snapshot for a refresh that returned the same data
+        param version: Version of the new snapshot
+        param timestamp: Time of the refresh
+        return: wiserSnapshot sharing all the data of this one
+        """
+        return wiserSnapshot(
+            version=version,
+            timestamp=timestamp,
+            sections=self.sections,
+            network=self.network,
+            indexes=self.indexes,
+            device2roomMap=self.device2roomMap,
+            nodeMap=self.nodeMap,
+            entities=self.entities,
+            scheduleIndex=self.scheduleIndex,
+            staleSections=self.staleSections,
+            unchanged=True,
+        )
+
+    def section(self, section):
+        """
+        Gets the hub json for a domain section
+        param section: Domain section name
+        return: List or Dict, empty if the hub did not send the section
+        """
+        return self.sections.get(section, {})
+
+    def get(self, section, entityId):
+        """
+        Gets one entity's hub json by id
+        param section: Domain section name
+        param entityId: The entity id
+        return: Dict or None
+        """
+        return self.indexes.get(section, {}).get(entityId)
+
+    @staticmethod
+    def trackEntities(indexes, system):
+        """
+        Gets the entities that are compared between snapshots to build change sets
+        param indexes: Dict of domain section to an id to entity dict
+        param system: System json
+        return: Dict of entity type to an id to entity dict
+        """
+        tracked = dict(indexes)
+        tracked["System"] = {None: system} if system else {}
+        return tracked
+
+    def trackedEntities(self):
+        return self.trackEntities(self.indexes, self.section("System"))
+
+
 class wiserHub:
     """
     Wiser Hub representation of a hub device, thermostat devices (iTRV and RoomStats), schedules, config switches
     and smart plugs
+
+    Accessors return the data from the last refresh and are empty before the first one.
+    When the hub is limited to some sections, the accessors for other sections are also
+    empty until a refresh has fetched them.  Reading one adds it to later refreshes, and
+    awaiting asyncLoadSections fetches it straight away.  Helpers built on a section, such
+    as homeAwayMode or deviceRoom, do not add it, and set functions fetch the sections
+    they need once without adding them.
     """
 
-    def __init__(self, host, api_key, api_version = 1):
-        """Setup session and host information"""
+    def __init__(
+        self,
+        host,
+        api_key,
+        api_version=1,
+        session=None,
+        connection_limit=CONNECTION_LIMIT,
+        refresh_policy=DEFAULT_REFRESH_POLICY,
+        write_coalesce_window=WRITE_COALESCE_WINDOW,
+        write_concurrency=WRITE_CONCURRENCY,
+        json_decoder=None,
+        entity_model=False,
+        stats_hook=None,
+        sections=None,
+        retries=GET_RETRIES,
+        retry_delay=RETRY_DELAY,
+        breaker_threshold=FAILURE_THRESHOLD,
+        breaker_probe_interval=PROBE_INTERVAL,
+        cache_file=None,
+        cache_write_interval=CACHE_WRITE_INTERVAL,
+    ):
+        """
+        Setup session and host information
+        param api_version: 2 to fetch schedules from the hub's v2 schedules api, every
+            V2_SCHEDULE_REFRESH seconds unless the refresh policy gives Schedule its own time,
+            rather than with the domain data on every poll
+        param session: Optional aiohttp ClientSession to share a connection pool between hubs.
+            If not given the hub creates and owns its own keep-alive session.
+        param connection_limit: Max simultaneous connections to the hub for an owned session
+        param refresh_policy: Dict of domain section (or network) to seconds between fetches.
+            Sections not in the policy are fetched on every poll.  Due sections are fetched
+            one request each when there are no more of them than connection_limit, otherwise
+            the whole domain is fetched at once and the due sections taken from it.  See
+            TIERED_REFRESH_POLICY.
+        param write_coalesce_window: Seconds to hold a write so later writes to the same path
+            can be merged into one PATCH.  0 sends every write immediately.
+        param write_concurrency: Max PATCH requests in flight at once, so bulk writes do
+            not overload the hub
+        param json_decoder: Function to decode response bytes, defaults to orjson or ujson
+            if installed, otherwise the standard library json
+        param entity_model: Also build compact typed entities on each refresh, see entity()
+        param stats_hook: Optional function called with a dict for every request and refresh,
+            see wiserHubStats
+        param sections: Domain sections to fetch on each refresh, such as ["Room", "SmartPlug"].
+            Other sections are not fetched or parsed until they are first read, and read as
+            empty until then.  Use asyncLoadSections to fetch them first.  Defaults to all.
+        param retries: Times a GET is retried after a connection error or server error.
+            Timeouts are not retried.
+        param retry_delay: Seconds before the first retry, doubling for each retry after
+        param breaker_threshold: Failed requests in a row before requests fail straight away
+            while the hub is probed in the background.  0 to always send requests.
+        param breaker_probe_interval: Seconds before the first background probe of a down hub
+        param cache_file: Optional path to keep the hub data on disk.  Cached data is loaded
+            here so accessors work before the first refresh, with stale True until every
+            cached section has been refreshed.
+        param cache_write_interval: Min seconds between cache writes
+        """
         self.host = host
         self.api_key = api_key
         self.headers = {
@@ -65,21 +352,53 @@ class wiserHub:
             "Content-Type": "application/json;charset=UTF-8",
         }
         self._api_version = api_version
-        self._cloud = {}
-        self._capability = {}
-        self._devices = {}
-        self._device2roomMap = {}
-        self._heating = {}
-        self._hotwater = {}
-        self._network = {}
-        self._nodeMap = {}
-        self._rooms = {}
-        self._roomstats = {}
-        self._system = {}
-        self._thermostats = {}
-        self._schedules = {}
-        self._smartplugs = {}
+        self._v2Schedules = api_version >= 2
+        self._v2ScheduleData = (None, None)
+        self._responseCache = {}
+        self._session = session
+        self._ownSession = session is None
+        self._connectionLimit = connection_limit
+        self._refreshPolicy = dict(refresh_policy)
+        # Schedules rarely change, so when they have their own api they are not fetched
+        # on every poll unless the policy says to
+        self._v2DefaultScheduleRefresh = self._v2Schedules and "Schedule" not in self._refreshPolicy
+        if self._v2DefaultScheduleRefresh:
+            self._refreshPolicy["Schedule"] = V2_SCHEDULE_REFRESH
+        if sections is None:
+            sections = DOMAIN_SECTIONS
+        for section in sections:
+            if section not in DOMAIN_SECTIONS:
+                raise WiserException(
+                    "InvalidSection",
+                    "Section {} is not valid.  Sections are {}".format(section, ", ".join(DOMAIN_SECTIONS))
+                )
+        self._activeSections = set(sections)
+        self._warnedSections = set()
+        self._sectionUpdated = {}
+        self._writeCoalesceWindow = write_coalesce_window
+        self._pendingWrites = {}
+        self._writeConcurrency = max(1, write_concurrency)
+        self._writeSemaphore = None
+        self._pendingState = {}
+        self._jsonDecoder = json_decoder or DEFAULT_JSON_DECODER
+        self._entityModel = entity_model
+        self._stats = wiserHubStats(hook=stats_hook)
+        self._retries = retries
+        self._retryDelay = retry_delay
+        self._breaker = wiserCircuitBreaker(
+            failure_threshold=breaker_threshold, probe_interval=breaker_probe_interval
+        )
+        self._refreshTasks = {}
+        self._lastRefreshTime = None
+        self._snapshot = wiserSnapshot()
+        self._cache = None
+        if cache_file is not None:
+            self._cache = wiserSnapshotCache(cache_file, host, write_interval=cache_write_interval)
+            self._loadCache()
         self._switches = {}
+        self._changeListeners = []
+        self._refreshListeners = []
+        self._writeListeners = []
 
     def _toWiserTemp(self, temp):
         """
@@ -110,111 +429,202 @@ class wiserHub:
         else:
             return True
 
-    async def request(self, mode="get", path="", json=None):
-        """Make a request to the Wiser Hub."""
-        url = WISERHUBURL.format(self.host) + WISERDATA + path
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _getSession(self):
+        """
+        Gets the http session used for hub requests, creating a pooled keep-alive
+        session on first use if one was not passed in
+        return: aiohttp.ClientSession
+        """
+        if self._session is None or (self._ownSession and self._session.closed):
+            connector = aiohttp.TCPConnector(
+                limit=self._connectionLimit,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """
+        Closes the http session if it is owned by this hub.  A session passed in
+        by the caller is left open for them to close.  Queued writes are sent first.
+        """
+        pendingTasks = [pending["task"] for pending in self._pendingWrites.values()]
+        await asyncio.gather(*pendingTasks, return_exceptions=True)
+        await self._saveCache(force=True)
+        self._breaker.stop()
+        if self._ownSession and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _endpointName(self, mode, url):
+        """
+        Names the endpoint of a url for stats, with entity ids replaced by {}
+        return: String such as PATCH domain/Room/{}
+        """
+        path = url[len(WISERHUBURL.format(self.host)):]
+        return "{} {}".format(
+            mode.upper(),
+            "/".join("{}" if part.isdigit() else part for part in path.split("/")),
+        )
+
+    async def _hubRequest(self, mode, url, json=None, timings=None):
+        """
+        Make a request to the Wiser Hub through the circuit breaker, retrying GETs that
+        fail with a connection or server error
+        param mode: get or patch
+        param url: The full url to request
+        param json: Payload for patch requests
+        param timings: Optional dict request timings are added to
+        return: Decoded json for get, response status for patch
+        """
+        attempt = 0
+        while True:
+            if not self._breaker.allow():
+                raise WiserHubException(
+                    "HubUnavailable",
+                    "Wiser Hub is not responding, waiting for it to come back"
+                )
+            try:
+                result = await self._apiRequest(mode, url, json=json, timings=timings)
+            except WiserHubException as ex:
+                if ex.status not in TRANSIENT_ERRORS:
+                    # The hub answered so it is up
+                    self._breaker.recordSuccess()
+                    raise
+                if mode != "get" or ex.status not in RETRY_ERRORS or attempt >= self._retries:
+                    self._breaker.recordFailure(probe=self._probeHub)
+                    raise
+                delay = self._retryDelay * 2 ** attempt
+                attempt += 1
+                _LOGGER.debug(
+                    "Retrying {} in {}s after error {}, attempt {} of {}".format(
+                        self._endpointName(mode, url), delay, ex.status, attempt, self._retries
+                    )
+                )
+                await asyncio.sleep(delay)
+            else:
+                self._breaker.recordSuccess()
+                return result
+
+    async def _probeHub(self):
+        """
+        Checks if the hub is answering requests, used by the circuit breaker
+        while the hub is down
+        """
+        try:
+            await self._apiRequest("get", WISERHUBURL.format(self.host) + WISERDATA + "System/")
+        except WiserHubException as ex:
+            if ex.status in TRANSIENT_ERRORS:
+                raise
+
+    @property
+    def circuitState(self):
+        """closed while requests are sent to the hub, open while they fail straight away"""
+        return self._breaker.state
+
+    def resetCircuit(self):
+        """Closes the circuit breaker so the next request is sent to the hub"""
+        self._breaker.reset()
+
+    async def _apiRequest(self, mode, url, json=None, timings=None):
+        """
+        Make a single http request to the Wiser Hub and record it in the hub stats
+        param mode: get or patch
+        param url: The full url to request
+        param json: Payload for patch requests
+        param timings: Optional dict the connect, transfer and decode seconds and response bytes are added to
+        return: Decoded json for get, response status for patch
+        """
+        timing = {"connect": 0, "transfer": 0, "decode": 0, "bytes": 0, "unchanged": False}
+        start = time.perf_counter()
+        error = None
+        try:
+            return await self._httpRequest(mode, url, json, timing)
+        except WiserHubException as ex:
+            error = ex.status
+            raise
+        except BaseException as ex:
+            # Cancellation and unexpected errors are failures too, recorded by class
+            error = type(ex).__name__
+            raise
+        finally:
+            size = timing.pop("bytes")
+            unchanged = timing.pop("unchanged")
+            self._stats.recordRequest(
+                self._endpointName(mode, url),
+                time.perf_counter() - start,
+                size=size,
+                error=error,
+                unchanged=unchanged,
+                **timing
+            )
+            if timings is not None:
+                for key, value in timing.items():
+                    timings[key] = timings.get(key, 0) + value
+                timings["bytes"] = timings.get("bytes", 0) + size
 
+    async def _httpRequest(self, mode, url, json, timing):
+        """
+        Make a single http request to the Wiser Hub and map failures to WiserHubException
+        param mode: get or patch
+        param url: The full url to request
+        param json: Payload for patch requests
+        param timing: Dict to record connect, transfer and decode seconds and response bytes in
+        return: Decoded json for get, response status for patch
+        """
         timeout = aiohttp.ClientTimeout(total=TIMEOUT)
 
         try:
-            if mode == "get":
-                async with aiohttp.request(
-                    url=url, method=mode, headers=self.headers, timeout=timeout
-                ) as resp:
-                    assert resp.status == 200
-                    hubData = await resp.json()
-                    if hubData:
-                        if hubData.get("Cloud"):
-                            self._cloud = hubData.get("Cloud")
-                        if hubData.get("Device"):
-                            self._devices = hubData.get("Device")
-                        if hubData.get("DeviceCapabilityMatrix"):
-                            self._capability = hubData.get("DeviceCapabilityMatrix")
-                        if hubData.get("HeatingChannel"):
-                            self._heating = hubData.get("HeatingChannel")
-                        if hubData.get("HotWater"):    
-                            self._hotwater = hubData.get("HotWater")
-                        if hubData.get("Room"):
-                            self._rooms = hubData.get("Room")
-                        if hubData.get("RoomStat"):
-                            self._roomstats = hubData.get("RoomStat")
-                        if hubData.get("Schedule"):
-                            self._schedules = hubData.get("Schedule")   
-                        if hubData.get("SmartPlug"):
-                            self._smartplugs = hubData.get("SmartPlug")
-                        if hubData.get("SmartValve"):
-                            self._thermostats = hubData.get("SmartValve")
-                        if hubData.get("System"):
-                            self._system = hubData.get("System")
-                            
-                        # Populate device to room mapping
-                        for room in self._rooms:
-                            roomStatId = room.get("RoomStatId")
-                            if roomStatId is not None:
-                                self._device2roomMap[roomStatId] = {
-                                    "roomId": room.get("id"),
-                                    "roomName": room.get("Name"),
-                                }
-                            if room.get("SmartValveIds") is not None:
-                                for valveId in room.get("SmartValveIds"):
-                                    self._device2roomMap[valveId] = {
-                                        "roomId": room.get("id"),
-                                        "roomName": room.get("Name"),
-                                    }
-
-                        # Populate node map
-                        for device in self._devices:
-                            if device.get("ProductType") in ["Controller", "SmartPlug"]:
-                                deviceName = "Unknown"
-                                nodeId = device.get("NodeId")
-                                if nodeId is not None:
-                                    if device.get("ProductType") == "Controller":
-                                        deviceName = "Wiser Hub"
-                                    elif device.get("ProductType") == "SmartPlug":
-                                        deviceName = self.smartPlug(device.get("id"))[
-                                            "Name"
-                                        ]
-                                    self._nodeMap[nodeId] = {
-                                        "deviceId": device.get("id"),
-                                        "productType": device.get("ProductType"),
-                                        "deviceName": deviceName,
-                                    }
-
-                        #Get network info
-                        url = WISERHUBURL.format(self.host) + WISERNETWORK + path
-                        async with aiohttp.request(
-                            url=url, method=mode, headers=self.headers, timeout=timeout
-                        ) as resp:
-                            assert resp.status == 200
-                            hubData = await resp.json()
-                            if hubData and hubData.get("Station"):
-                                self._network = hubData
-                        return True
+            start = time.perf_counter()
+            async with self._getSession().request(
+                url=url,
+                method=mode,
+                headers=self.headers,
+                timeout=timeout,
+                json=json,
+            ) as resp:
+                timing["connect"] = time.perf_counter() - start
+                if resp.status != 200:
+                    _LOGGER.debug("Wiser Hub returned error response {}".format(resp.status))
+                    if resp.status == 401:
+                        raise WiserHubException("AuthenticationError", "Authentication error.  Check secret key.")
+                    elif resp.status == 404:
+                        raise WiserHubException("InvalidAPICall", "Api path not found.")
+                    elif resp.status >= 500:
+                        raise WiserHubException("ServerError", "Wiser Hub server error {}.".format(resp.status))
                     else:
-                        return False
-                        
-            elif mode == "patch":
-                async with aiohttp.request(
-                    url=url,
-                    method=mode,
-                    headers=self.headers,
-                    timeout=timeout,
-                    json=json,
-                ) as resp:
-                    assert resp.status == 200
-                    return resp.status
-                    
-        except AssertionError as ex:
-            _LOGGER.debug("Wiser Hub returned an error response")
-            if resp.status == 401:
-                raise WiserHubException("AuthenticationError", "Authentication error.  Check secret key.")
-            elif resp.status == 404:
-                raise WiserHubException("InvalidAPICall", "Api path not found.")
-            else:
-                raise WiserHubException("APIError", "Unknown API or connection error.")
-        except AttributeError as ex:
-            _LOGGER.debug("Data not returned from Wiser Hub")
-            raise WiserHubException("NoData", "Data not returned from Wiser Hub")
+                        raise WiserHubException("APIError", "Unknown API or connection error.")
+                if mode == "get":
+                    start = time.perf_counter()
+                    body = await resp.read()
+                    timing["transfer"] = time.perf_counter() - start
+                    timing["bytes"] = len(body)
+                    if not body.strip():
+                        return None
+                    # Same bytes as last time decode to the same data, so reuse it.  Keeping
+                    # the same object also lets the snapshot build skip unchanged sections.
+                    digest = hashlib.blake2b(body, digest_size=16).digest()
+                    cached = self._responseCache.get(url)
+                    if cached is not None and cached[0] == digest:
+                        timing["unchanged"] = True
+                        return cached[1]
+                    try:
+                        start = time.perf_counter()
+                        data = self._jsonDecoder(body)
+                        timing["decode"] = time.perf_counter() - start
+                        self._responseCache[url] = (digest, data)
+                        return data
+                    except ValueError as ex:
+                        _LOGGER.debug("Invalid json returned from Wiser Hub.  Error {}".format(ex))
+                        raise WiserHubException("InvalidData", "Invalid data returned from Wiser Hub")
+                return resp.status
+
         except aiohttp.ClientConnectionError as ex:
             _LOGGER.debug("Connection error trying to update from Wiser Hub")
             raise WiserHubException("ConnectionError", "Connection error trying to update from Wiser Hub")
@@ -224,146 +634,1127 @@ class wiserHub:
             )
             raise WiserHubException("TimeoutError", "Timed out trying to update from Wiser Hub")
 
-    async def asyncGetHubData(self):
+    async def request(self, mode="get", path="", json=None):
+        """Make a request to the Wiser Hub."""
+        if mode == "get":
+            return await self._singleFlightRefresh(path)
+        elif mode == "patch":
+            if self._writeCoalesceWindow > 0:
+                return await self._queueWrite(path, json)
+            return await self._sendWrite(path, json)
+
+    async def _singleFlightRefresh(self, path=""):
+        """
+        Runs a refresh, or joins the refresh already in progress so concurrent callers
+        share one set of requests and all get its result
+        param path: Optional path appended to the domain url
+        return: Boolean
+        """
+        task = self._refreshTasks.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(path))
+            self._refreshTasks[path] = task
+
+            def refreshDone(task):
+                self._refreshTasks.pop(path, None)
+                # Retrieve the exception so it is not reported if every caller was cancelled
+                if not task.cancelled():
+                    task.exception()
+
+            task.add_done_callback(refreshDone)
+        else:
+            _LOGGER.debug("Joining refresh already in progress")
+        # Shield so one caller being cancelled does not cancel the refresh for the others
+        return await asyncio.shield(task)
+
+    async def _sendWrite(self, path, json):
+        """
+        Sends a PATCH to the hub, applies its expected result to the local state and
+        notifies write listeners
+        param path: Api path under the domain
+        param json: Payload to send
+        return: Response status
+        """
+        url = WISERHUBURL.format(self.host) + WISERDATA + path
+        if self._writeSemaphore is None:
+            self._writeSemaphore = asyncio.Semaphore(self._writeConcurrency)
+        async with self._writeSemaphore:
+            status = await self._hubRequest("patch", url, json=json)
+        # Taken from the payload sent, which may merge several callers' writes
+        expected = self._expectedState(path, json)
+        if expected is not None:
+            await self._applyOptimistic(*expected)
+        self.invalidateSections(path.split("/")[0])
+        for listener in list(self._writeListeners):
+            listener(path)
+        return status
+
+    async def _queueWrite(self, path, json):
+        """
+        Queues a PATCH for the coalesce window.  Writes to the same path in the window are
+        merged into one PATCH, with later top level keys replacing earlier ones, and every
+        caller gets the result of that PATCH.
+        param path: Api path under the domain
+        param json: Payload to send
+        return: Response status
+        """
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pendingWrites.get(path)
+        if pending is None:
+            pending = {"json": dict(json or {}), "futures": [future]}
+            pending["task"] = asyncio.ensure_future(self._flushWrite(path, pending))
+            self._pendingWrites[path] = pending
+        else:
+            _LOGGER.debug("Merging write to {} with pending write".format(path))
+            pending["json"].update(json or {})
+            pending["futures"].append(future)
+        return await future
+
+    async def _flushWrite(self, path, pending):
+        """
+        Sends the merged write for a path once its coalesce window has passed.  If the
+        flush is cancelled the callers waiting on it are cancelled too.
+        param path: Api path under the domain
+        param pending: The pending write queued for the path
+        """
+        try:
+            await asyncio.sleep(self._writeCoalesceWindow)
+            if self._pendingWrites.get(path) is pending:
+                del self._pendingWrites[path]
+            status = await self._sendWrite(path, pending["json"])
+        except asyncio.CancelledError:
+            if self._pendingWrites.get(path) is pending:
+                del self._pendingWrites[path]
+            for future in pending["futures"]:
+                future.cancel()
+            raise
+        except Exception as ex:
+            for future in pending["futures"]:
+                if not future.done():
+                    future.set_exception(ex)
+        else:
+            for future in pending["futures"]:
+                if not future.done():
+                    future.set_result(status)
+
+    async def _refresh(self, path=""):
+        """
+        Refreshes the hub state and records the refresh in the hub stats
+        return: Boolean
+        """
+        timings = dict.fromkeys(REFRESH_PHASES, 0)
+        timings["bytes"] = 0
+        start = time.perf_counter()
+        error = None
+        try:
+            return await self._refreshState(path, timings)
+        except WiserHubException as ex:
+            error = ex.status
+            raise
+        except BaseException as ex:
+            # Cancellation and unexpected errors are failures too, recorded by class
+            error = type(ex).__name__
+            raise
+        finally:
+            size = timings.pop("bytes")
+            unchanged = timings.pop("unchanged", False)
+            self._stats.recordRefresh(
+                time.perf_counter() - start, timings, size=size, error=error, unchanged=unchanged
+            )
+
+    async def _refreshState(self, path, timings):
+        """
+        Fetches the domain and network data from the hub concurrently and updates the hub state.
+        A failed network request keeps the previous network data rather than losing the domain data.
+        param path: Optional path appended to the domain url
+        param timings: Dict the phase timings and response bytes are added to
+        return: Boolean
+        """
+        now = time.monotonic()
+        dueSections = [
+            section
+            for section in DOMAIN_SECTIONS
+            if section in self._activeSections and self._isSectionDue(section, now)
+        ]
+        # With the v2 api schedules come from it, on their own refresh policy, and are
+        # never taken from the domain data
+        sections = [
+            section
+            for section in dueSections
+            if not (self._v2Schedules and section == "Schedule")
+        ]
+        # Each section is its own request and only connection_limit of them run at once,
+        # so past that one domain request is quicker than waiting on rounds of them.  Only
+        # the due sections are taken from it, the others keep their data until they are due.
+        wholeDomain = (
+            bool(path)
+            or len(dueSections) == len(DOMAIN_SECTIONS)
+            or len(sections) > self._connectionLimit
+        )
+        fetchSchedules = self._v2Schedules and not path and "Schedule" in dueSections
+        if path:
+            sections = None
+
+        requests = [self._fetchDomain(None if wholeDomain else sections, path, timings)]
+        if fetchSchedules:
+            requests.append(self._fetchV2Schedules(timings))
+        if self._isSectionDue(NETWORK_SECTION, now):
+            requests.append(
+                self._hubRequest(
+                    "get", WISERHUBURL.format(self.host) + WISERNETWORK + path, timings=timings
+                )
+            )
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        domainData = results.pop(0)
+        scheduleData = results.pop(0) if fetchSchedules else None
+        networkData = results[0] if results else None
+        if isinstance(domainData, BaseException):
+            raise domainData
+
+        if isinstance(scheduleData, WiserHubException):
+            _LOGGER.debug(
+                "Unable to update schedules from Wiser Hub v2 api, error {} {}".format(
+                    scheduleData.status, scheduleData.message
+                )
+            )
+            if scheduleData.status == "InvalidAPICall":
+                # Hub has no v2 api so go back to the domain schedules
+                self._v2Schedules = False
+                if self._v2DefaultScheduleRefresh:
+                    del self._refreshPolicy["Schedule"]
+                self.invalidateSections("Schedule")
+            scheduleData = None
+        elif isinstance(scheduleData, BaseException):
+            raise scheduleData
+
+        if isinstance(networkData, WiserHubException):
+            _LOGGER.debug(
+                "Unable to update network data from Wiser Hub, error {} {}".format(
+                    networkData.status, networkData.message
+                )
+            )
+            networkData = None
+        elif isinstance(networkData, BaseException):
+            raise networkData
+
+        if not domainData and wholeDomain:
+            return False
+        if scheduleData is not None:
+            rawSchedules, schedules = self._v2ScheduleData
+            if scheduleData is not rawSchedules:
+                schedules = fromV2Schedules(scheduleData)
+                self._v2ScheduleData = (scheduleData, schedules)
+            # Decoded data is shared with the response cache so is copied, not changed
+            domainData = dict(domainData, Schedule=schedules)
+            sections = sections + ["Schedule"]
+
+        if not (networkData and networkData.get("Station")):
+            networkData = None
+        if not path:
+            domainData = self._reconcilePending(domainData, sections, now)
+        try:
+            start = time.perf_counter()
+            if self._isUnchanged(domainData, sections, networkData):
+                snapshot = self._snapshot.refreshed(self._snapshot.version + 1, time.time())
+                timings["unchanged"] = True
+            else:
+                snapshot = self._buildSnapshot(domainData, sections, networkData)
+            timings["build"] = time.perf_counter() - start
+        except AttributeError:
+            _LOGGER.debug("Data not returned from Wiser Hub")
+            raise WiserHubException("NoData", "Data not returned from Wiser Hub")
+
+        # Swap in the new state in one step
+        self._snapshot = snapshot
+        for section in DOMAIN_SECTIONS if sections is None else sections:
+            self._sectionUpdated[section] = now
+        if networkData is not None:
+            self._sectionUpdated[NETWORK_SECTION] = now
+        self._lastRefreshTime = now
+        await self._saveCache()
+
+        await self._notifyListeners(self._refreshListeners, snapshot)
+        if snapshot.changes:
+            await self._notifyListeners(self._changeListeners, snapshot.changes)
+        return True
+
+    async def _fetchV2Schedules(self, timings=None):
+        """
+        Fetches all schedules from the v2 schedules api
+        param timings: Optional dict request timings are added to
+        return: Dict of schedule type to list of schedules
+        """
+        return await self._hubRequest(
+            "get",
+            WISERHUBURL.format(self.host) + WISERV2API + WISERV2SCHEDULE.format(""),
+            timings=timings,
+        )
+
+    def _loadCache(self):
+        """Loads cached hub data as a stale snapshot"""
+        data = self._cache.load()
+        if data is None:
+            return
+        try:
+            self._snapshot = self._buildSnapshot(
+                data.get("sections") or {},
+                None,
+                data.get("network") or None,
+                timestamp=data.get("timestamp"),
+                stale=True,
+            )
+        except (AttributeError, TypeError) as ex:
+            _LOGGER.debug("Unable to use Wiser Hub cache {}.  Error {}".format(self._cache.path, ex))
+            return
+        _LOGGER.debug("Loaded Wiser Hub data from cache {}".format(self._cache.path))
+
+    async def _saveCache(self, force=False):
+        """
+        Writes the current snapshot to the cache file if one is set and a write is due.
+        Errors are logged rather than failing the refresh.
+        param force: Ignore the cache write interval
+        """
+        if self._cache is None or not self._cache.isDue(self._snapshot, force):
+            return
+        try:
+            await self._cache.save(self._snapshot)
+        except (OSError, TypeError, ValueError) as ex:
+            _LOGGER.error("Error writing Wiser Hub cache {}.  Error {}".format(self._cache.path, ex))
+
+    @property
+    def stale(self):
+        """True while any of the hub data is from the cache and has not been refreshed yet"""
+        return self._snapshot.stale
+
+    @property
+    def staleSections(self):
+        """Domain sections, and network, that are from the cache and not yet refreshed"""
+        return sorted(self._snapshot.staleSections)
+
+    async def _fetchDomain(self, sections, path="", timings=None):
+        """
+        Fetches the full domain payload, or only the given sections of it
+        param sections: List of domain sections to fetch, or None for the full payload
+        param path: Optional path appended to the domain url for a full fetch
+        param timings: Optional dict request timings are added to
+        return: Dict of domain section to data
+        """
+        url = WISERHUBURL.format(self.host) + WISERDATA
+        if sections is None:
+            return await self._hubRequest("get", url + path, timings=timings)
+        results = await asyncio.gather(
+            *[
+                self._hubRequest("get", url + section + "/", timings=timings)
+                for section in sections
+            ],
+            return_exceptions=True,
+        )
+        domainData = {}
+        for section, result in zip(sections, results):
+            if isinstance(result, WiserHubException) and result.status == "InvalidAPICall":
+                # Hub does not have this section
+                result = None
+            elif isinstance(result, BaseException):
+                raise result
+            domainData[section] = result
+        return domainData
+
+    def _isSectionDue(self, section, now):
+        """
+        Checks if a section needs fetching under the refresh policy
+        param section: Domain section name or network
+        param now: Current monotonic time
+        return: Boolean
+        """
+        ttl = self._refreshPolicy.get(section, 0)
+        updated = self._sectionUpdated.get(section)
+        return ttl <= 0 or updated is None or now - updated >= ttl
+
+    def invalidateSections(self, *sections):
+        """
+        Marks sections as out of date so they are fetched on the next refresh regardless
+        of the refresh policy.  Writes to the hub invalidate the section they change.
+        param sections: Domain section names (case insensitive) or network
+        """
+        for section in sections:
+            for known in DOMAIN_SECTIONS + [NETWORK_SECTION]:
+                if known.lower() == section.lower():
+                    self._sectionUpdated.pop(known, None)
+
+    def _expectedState(self, path, json):
+        """
+        Works out the hub fields a successful PATCH will change, so they can be shown
+        before the next refresh
+        param path: Api path under the domain, such as Room/3
+        param json: Payload sent
+        return: Tuple of (section, entity id, dict of field to expected value), or None if
+            the result is not known
+        """
+        if not isinstance(json, dict):
+            return None
+        parts = [part for part in path.split("/") if part]
+        section = next(
+            (known for known in DOMAIN_SECTIONS if parts and known.lower() == parts[0].lower()), None
+        )
+        entityId = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+        override = json.get("RequestOverride") or {}
+        fields = {}
+        if section == "System":
+            if parts[1:] != ["RequestOverride"]:
+                return None
+            fields["OverrideType"] = "Away" if json.get("type") == 2 else "None"
+        elif section == "Room" and entityId is not None:
+            if "Mode" in json:
+                fields["Mode"] = json["Mode"]
+            if override.get("Type") == "Manual":
+                fields["CurrentSetPoint"] = override.get("SetPoint")
+                fields["DisplayedSetPoint"] = override.get("SetPoint")
+            elif override:
+                room = self._snapshot.get("Room", entityId) or {}
+                if fields.get("Mode", room.get("Mode")) == "Auto" and "ScheduledSetPoint" in room:
+                    # Without an override the room follows its schedule
+                    fields["CurrentSetPoint"] = room["ScheduledSetPoint"]
+                    fields["DisplayedSetPoint"] = room["ScheduledSetPoint"]
+        elif section == "SmartPlug" and entityId is not None:
+            if "RequestOutput" in json:
+                fields["ManualState"] = json["RequestOutput"]
+                fields["OutputState"] = json["RequestOutput"]
+            if "Mode" in json:
+                fields["Mode"] = json["Mode"]
+        elif section == "HotWater" and entityId is not None:
+            if override.get("Type") == "Manual":
+                fields["OverrideType"] = "Manual"
+                fields["WaterHeatingState"] = "On" if override.get("SetPoint", 0) > 0 else "Off"
+            elif override:
+                fields["OverrideType"] = "None"
+        elif section == "Schedule" and entityId is not None:
+            fields = {key: value for key, value in json.items() if key != "id"}
+        if not fields:
+            return None
+        return section, entityId, fields
+
+    async def _applyOptimistic(self, section, entityId, fields):
+        """
+        Applies the expected result of a successful write to the local state straight
+        away, marked pending until a refresh confirms or contradicts it
+        param section: Domain section written to
+        param entityId: The entity id, or None for the System section
+        param fields: Dict of hub field to the value expected after the write
+        """
+        sectionData = self._snapshot.sections.get(section)
+        # No refresh would confirm a write to a section refreshes do not fetch
+        if not sectionData or section not in self._activeSections:
+            return
+        if isinstance(sectionData, dict):
+            updated = dict(sectionData, **fields)
+        else:
+            updated = [
+                dict(entity, **fields) if entity.get("id") == entityId else entity
+                for entity in sectionData
+            ]
+        key = (section, entityId)
+        pending = self._pendingState.get(key)
+        self._pendingState[key] = {
+            "fields": dict(pending["fields"], **fields) if pending else fields,
+            "time": time.monotonic(),
+        }
+        self._snapshot = self._buildSnapshot(
+            {section: updated}, [section], None, stale=section in self._snapshot.staleSections
+        )
+        if self._snapshot.changes:
+            await self._notifyListeners(self._changeListeners, self._snapshot.changes)
+
+    def _reconcilePending(self, domainData, sections, refreshStart):
+        """
+        Checks pending write results against refreshed data.  Confirmed ones are cleared,
+        contradicted ones are dropped so the hub's values replace them.  Writes made after
+        the refresh started are applied on top of the refreshed data and stay pending.
+        param domainData: Freshly decoded domain data, updated in place
+        param sections: The sections that were fetched, or None for all of them
+        param refreshStart: time.monotonic() the refresh started
+        return: The domain data, copied where pending writes were applied to it
+        """
+        for (section, entityId), pending in list(self._pendingState.items()):
+            if sections is not None and section not in sections:
+                continue
+            sectionData = domainData.get(section)
+            if isinstance(sectionData, dict):
+                entity = sectionData
+            else:
+                entity = next(
+                    (item for item in sectionData or [] if item.get("id") == entityId), None
+                )
+            if entity is None:
+                del self._pendingState[(section, entityId)]
+            elif pending["time"] >= refreshStart:
+                # Copy rather than update in place, identical responses reuse the decoded data
+                if isinstance(sectionData, dict):
+                    updated = dict(sectionData, **pending["fields"])
+                else:
+                    updated = [
+                        dict(item, **pending["fields"]) if item is entity else item
+                        for item in sectionData
+                    ]
+                domainData = dict(domainData)
+                domainData[section] = updated
+            else:
+                del self._pendingState[(section, entityId)]
+                if any(entity.get(field) != value for field, value in pending["fields"].items()):
+                    _LOGGER.debug(
+                        "Wiser Hub did not apply write to {} {}, rolling back".format(section, entityId)
+                    )
+        return domainData
+
+    def _isUnchanged(self, domainData, sections, networkData):
+        """
+        Checks if a refresh returned the same data objects as the current snapshot was
+        built from, which the response cache gives when the hub sends the same bytes
+        param domainData: Dict of domain section to hub json
+        param sections: The sections that were fetched, or None for all of them
+        param networkData: Network json, or None if it was not fetched
+        return: Boolean
+        """
+        previous = self._snapshot
+        if not previous.sections:
+            return False
+        if networkData is not None and (
+            networkData is not previous.network or NETWORK_SECTION in previous.staleSections
+        ):
+            return False
+        for section in DOMAIN_SECTIONS if sections is None else sections:
+            if section in previous.staleSections:
+                return False
+            current = domainData.get(section)
+            before = previous.sections.get(section)
+            # Missing and empty sections count as the same
+            if current is not before and (current or before):
+                return False
+        return True
+
+    @property
+    def pendingState(self):
+        """
+        Writes applied to the local state that no refresh has confirmed yet
+        return: Dict of (section, entity id) to the expected field values
+        """
+        return {key: dict(pending["fields"]) for key, pending in self._pendingState.items()}
+
+    def isPending(self, section, entityId=None):
+        """
+        Checks if an entity has written values not yet confirmed by a refresh
+        param section: Domain section name
+        param entityId: The entity id, or None for the System section
+        return: Boolean
+        """
+        return (section, entityId) in self._pendingState
+
+    @property
+    def refreshPolicy(self):
+        return self._refreshPolicy
+
+    @property
+    def activeSections(self):
+        """Domain sections fetched on each refresh"""
+        return sorted(self._activeSections)
+
+    def _useSection(self, section):
+        """
+        Adds a section to refreshes the first time it is read.  Until the next refresh
+        fetches it the section reads as empty, which is logged as a warning if the hub
+        already has data, so callers know to use asyncLoadSections first.
+        param section: Domain section name
+        """
+        if section not in self._activeSections:
+            self._activeSections.add(section)
+            if self._snapshot.sections and section not in self._snapshot.sections:
+                _LOGGER.warning(
+                    "Wiser Hub section {} read before it was fetched, it is empty until the next "
+                    "refresh.  Add it to sections or await asyncLoadSections(\"{}\") first.".format(
+                        section, section
+                    )
+                )
+            else:
+                _LOGGER.debug("Section {} read for the first time, adding it to refreshes".format(section))
+
+    def _section(self, section):
+        self._useSection(section)
+        return self._snapshot.section(section)
+
+    def _get(self, section, entityId):
+        self._useSection(section)
+        return self._snapshot.get(section, entityId)
+
+    def _checkSection(self, section):
+        """
+        Logs a warning, once per section, when a helper reads a section that refreshes
+        do not fetch and that has not been loaded.  Helpers built on a section do not add
+        it to refreshes, only reading the section itself does.
+        param section: Domain section name
+        """
+        if (
+            section not in self._activeSections
+            and section not in self._snapshot.sections
+            and section not in self._warnedSections
+        ):
+            self._warnedSections.add(section)
+            _LOGGER.warning(
+                "Wiser Hub section {} is not fetched so reads as empty.  Add it to sections "
+                "or await asyncLoadSections(\"{}\") first.".format(section, section)
+            )
+
+    def _peekSection(self, section):
+        self._checkSection(section)
+        return self._snapshot.section(section)
+
+    def _peek(self, section, entityId):
+        self._checkSection(section)
+        return self._snapshot.get(section, entityId)
+
+    async def _asyncEnsureSections(self, *sections):
+        """
+        Makes sure sections have data before a set function reads them.  Sections that
+        refreshes fetch come from a refresh, others are fetched once without adding them
+        to refreshes.
+        param sections: Domain section names
+        """
+        missing = [section for section in sections if section not in self._snapshot.sections]
+        if any(section in self._activeSections for section in missing):
+            await self.request()
+            missing = [section for section in missing if section not in self._snapshot.sections]
+        if not missing:
+            return
+        _LOGGER.debug("Fetching sections {} once for a set function".format(", ".join(missing)))
+        domainData = await self._fetchDomain(missing)
+        self._snapshot = self._buildSnapshot(domainData, missing, None)
+        if self._snapshot.changes:
+            await self._notifyListeners(self._changeListeners, self._snapshot.changes)
+
+    async def asyncLoadSections(self, *sections):
+        """
+        Adds sections to refreshes and fetches any that have not been fetched yet, so
+        the accessors for them return data straight away
+        param sections: Domain section names
+        """
+        for section in sections:
+            if section not in DOMAIN_SECTIONS:
+                raise WiserException(
+                    "InvalidSection",
+                    "Section {} is not valid.  Sections are {}".format(section, ", ".join(DOMAIN_SECTIONS))
+                )
+            self._activeSections.add(section)
+        if any(section not in self._snapshot.sections for section in sections):
+            await self.request()
+
+    def _diffEntities(self, previous, current):
+        """
+        Compares two sets of tracked entities
+        param previous: Tracked entities before the refresh
+        param current: Tracked entities after the refresh
+        return: List of wiserChange
+        """
+        changes = []
+        for entityType, entities in current.items():
+            oldEntities = previous.get(entityType, {})
+            for entityId, entity in entities.items():
+                oldEntity = oldEntities.get(entityId)
+                if oldEntity is None:
+                    changes.append(wiserChange(
+                        entityType,
+                        entityId,
+                        CHANGE_ADDED,
+                        {field: (None, value) for field, value in entity.items()},
+                    ))
+                elif oldEntity is not entity and oldEntity != entity:
+                    fields = {
+                        field: (oldEntity.get(field), entity.get(field))
+                        for field in oldEntity.keys() | entity.keys()
+                        if oldEntity.get(field) != entity.get(field)
+                    }
+                    changes.append(wiserChange(entityType, entityId, CHANGE_CHANGED, fields))
+            for entityId, oldEntity in oldEntities.items():
+                if entityId not in entities:
+                    changes.append(wiserChange(
+                        entityType,
+                        entityId,
+                        CHANGE_REMOVED,
+                        {field: (value, None) for field, value in oldEntity.items()},
+                    ))
+        return changes
+
+    async def _notifyListeners(self, listeners, value):
+        """
+        Calls registered listeners after a refresh.  Listener errors are logged so one
+        bad listener does not fail the refresh.
+        param listeners: List of functions or coroutine functions
+        param value: Value to pass to each listener
+        """
+        for listener in list(listeners):
+            try:
+                result = listener(value)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as ex:
+                _LOGGER.error("Error in Wiser Hub listener {}".format(ex))
+
+    def _addListener(self, listeners, listener):
+        listeners.append(listener)
+
+        def removeListener():
+            if listener in listeners:
+                listeners.remove(listener)
+
+        return removeListener
+
+    def addChangeListener(self, listener):
+        """
+        Registers a callback that is called with the list of wiserChange after each
+        refresh that changed something.  The callback can be a function or coroutine function.
+        param listener: Callable taking a list of wiserChange
+        return: Function that removes the listener
+        """
+        return self._addListener(self._changeListeners, listener)
+
+    def addRefreshListener(self, listener):
+        """
+        Registers a callback that is called with the new wiserSnapshot after every
+        successful refresh, whether or not anything changed.  The callback can be a
+        function or coroutine function.
+        param listener: Callable taking a wiserSnapshot
+        return: Function that removes the listener
+        """
+        return self._addListener(self._refreshListeners, listener)
+
+    def addWriteListener(self, listener):
+        """
+        Registers a callback that is called with the api path after each successful write to the hub
+        param listener: Callable taking the patched path
+        return: Function that removes the listener
+        """
+        return self._addListener(self._writeListeners, listener)
+
+    async def changes(self):
+        """
+        Async iterator of the change sets from each refresh that changed something.
+
+        async for changes in hub.changes():
+            ...
+        """
+        queue = asyncio.Queue()
+        removeListener = self.addChangeListener(queue.put_nowait)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            removeListener()
+
+    def _indexById(self, entities):
+        """
+        Builds an id to entity lookup for a list of hub entities
+        param entities: List of entity dicts from the hub
+        return: Dict
+        """
+        return {entity.get("id"): entity for entity in entities}
+
+    def _buildDevice2RoomMap(self, rooms):
+        """
+        Maps roomstat and smart valve ids to the room they are in
+        param rooms: List of room dicts
+        return: Dict
+        """
+        device2roomMap = {}
+        for room in rooms:
+            roomStatId = room.get("RoomStatId")
+            if roomStatId is not None:
+                device2roomMap[roomStatId] = {
+                    "roomId": room.get("id"),
+                    "roomName": room.get("Name"),
+                }
+            if room.get("SmartValveIds") is not None:
+                for valveId in room.get("SmartValveIds"):
+                    device2roomMap[valveId] = {
+                        "roomId": room.get("id"),
+                        "roomName": room.get("Name"),
+                    }
+        return device2roomMap
+
+    def _buildNodeMap(self, devices, smartplugIndex):
+        """
+        Maps zigbee node ids of the hub and smart plugs, which relay for other devices
+        param devices: List of device dicts
+        param smartplugIndex: Dict of smart plug id to smart plug
+        return: Dict
+        """
+        nodeMap = {}
+        for device in devices:
+            if device.get("ProductType") in ["Controller", "SmartPlug"]:
+                deviceName = "Unknown"
+                nodeId = device.get("NodeId")
+                if nodeId is not None:
+                    if device.get("ProductType") == "Controller":
+                        deviceName = "Wiser Hub"
+                    elif device.get("ProductType") == "SmartPlug":
+                        deviceName = smartplugIndex.get(device.get("id"), {}).get("Name", deviceName)
+                    nodeMap[nodeId] = {
+                        "deviceId": device.get("id"),
+                        "productType": device.get("ProductType"),
+                        "deviceName": deviceName,
+                    }
+        return nodeMap
+
+    def _buildSnapshot(self, domainData, sections, networkData, timestamp=None, stale=False):
+        """
+        Builds the next snapshot from the refreshed data.  Sections that were not
+        fetched, and indexes and maps built only from them, are carried over.
+        param domainData: Dict of domain section to hub json
+        param sections: The sections that were fetched, or None for all of them
+        param networkData: Network json, or None to keep the previous network data
+        param timestamp: Time the data is from, defaults to now
+        param stale: True if the data is not from a live refresh.  Stale sections stay
+            stale until a refresh fetches them.
+        return: wiserSnapshot
+        """
+        previous = self._snapshot
+        sectionData = dict(previous.sections)
+        for section in DOMAIN_SECTIONS if sections is None else sections:
+            # A missing section means the hub no longer has any of it
+            sectionData[section] = domainData.get(section) or {}
+        updated = set(DOMAIN_SECTIONS if sections is None else sections)
+        if networkData is not None:
+            updated.add(NETWORK_SECTION)
+        if stale:
+            staleSections = previous.staleSections | updated
+        else:
+            staleSections = previous.staleSections - updated
+
+        def unchanged(*names):
+            return all(sectionData.get(name) is previous.sections.get(name) for name in names)
+
+        indexes = {}
+        for section in INDEXED_SECTIONS:
+            if unchanged(section):
+                indexes[section] = previous.indexes.get(section, {})
+            else:
+                indexes[section] = self._indexById(sectionData[section])
+
+        if unchanged("Room"):
+            device2roomMap = previous.device2roomMap
+        else:
+            device2roomMap = self._buildDevice2RoomMap(sectionData["Room"])
+
+        if unchanged("Device", "SmartPlug"):
+            nodeMap = previous.nodeMap
+        else:
+            nodeMap = self._buildNodeMap(sectionData.get("Device", {}), indexes["SmartPlug"])
+
+        entities = {}
+        if self._entityModel:
+            for section, entityClass in ENTITY_CLASSES.items():
+                if unchanged(section) and section in previous.entities:
+                    entities[section] = previous.entities[section]
+                else:
+                    entities[section] = {
+                        entityId: entityClass(data, self._fromWiserTemp)
+                        for entityId, data in indexes[section].items()
+                    }
+
+        if unchanged("Schedule"):
+            scheduleIndex = previous.scheduleIndex
+        else:
+            scheduleIndex = wiserScheduleIndex.build(
+                sectionData.get("Schedule"), self._fromWiserTemp, previous.scheduleIndex
+            )
+
+        changes = self._diffEntities(
+            previous.trackedEntities(),
+            wiserSnapshot.trackEntities(indexes, sectionData.get("System", {})),
+        )
+        return wiserSnapshot(
+            version=previous.version + 1,
+            timestamp=timestamp or time.time(),
+            sections=sectionData,
+            network=networkData if networkData is not None else previous.network,
+            indexes=indexes,
+            device2roomMap=device2roomMap,
+            nodeMap=nodeMap,
+            entities=entities,
+            scheduleIndex=scheduleIndex,
+            changes=changes,
+            staleSections=staleSections,
+        )
+
+    def _isFresh(self, max_age):
+        """
+        Checks if the last refresh is recent enough to use without fetching again
+        param max_age: Max seconds since the last refresh, or None to always refresh
+        return: Boolean
+        """
+        return (
+            max_age is not None
+            and self._lastRefreshTime is not None
+            and time.monotonic() - self._lastRefreshTime <= max_age
+        )
+
+    async def asyncGetHubData(self, max_age=None):
+        """
+        Refreshes the hub data.  Calls made while a refresh is running join it.
+        param max_age: If the last refresh was within this many seconds the cached data is used
+        return: Boolean
+        """
+        if self._isFresh(max_age):
+            return True
         return await self.request()
 
+    async def asyncGetHubChanges(self, max_age=None):
+        """
+        Refreshes the hub data and returns what changed since the previous refresh
+        param max_age: If the last refresh was within this many seconds no request is made
+            and no changes are returned
+        return: List of wiserChange
+        """
+        if self._isFresh(max_age):
+            return []
+        await self.request()
+        return self._snapshot.changes
+
+    def entities(self, entityType):
+        """
+        Gets the typed entities of one type.  Requires entity_model=True.
+        param entityType: Device, HeatingChannel, Room, RoomStat, SmartPlug or SmartValve
+        return: Dict of id to entity
+        """
+        self._useSection(entityType)
+        return self._snapshot.entities.get(entityType, {})
+
+    def entity(self, entityType, entityId):
+        """
+        Gets a single typed entity, such as a wiserRoom with temperatures in degrees.
+        Requires entity_model=True.
+        param entityType: Device, HeatingChannel, Room, RoomStat, SmartPlug or SmartValve
+        param entityId: The entity id
+        return: wiserEntity or None
+        """
+        self._useSection(entityType)
+        return self._snapshot.entities.get(entityType, {}).get(entityId)
+
+    @property
+    def stats(self):
+        """Request and refresh stats for this hub as a wiserHubStats"""
+        return self._stats
+
+    @property
+    def snapshot(self):
+        """The current wiserSnapshot.  Hold on to it for a consistent view across reads."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Version of the current snapshot, increasing with each refresh"""
+        return self._snapshot.version
+
+    @property
+    def lastRefreshUnchanged(self):
+        """True if the last refresh returned exactly the same data as the one before"""
+        return self._snapshot.unchanged
+
+    @property
+    def lastChanges(self):
+        """Changes found by the most recent refresh as a list of wiserChange"""
+        return self._snapshot.changes
+
     @property
     def name(self):
         try:
-            return self._network.get("Station").get("NetworkInterface").get("HostName")
+            return self.network.get("Station").get("NetworkInterface").get("HostName")
         except (KeyError, AttributeError):
             return None
             
     @property
     def network(self):
-        return self._network
+        return self._snapshot.network
 
     @property
     def system(self):
-        return self._system
+        return self._section("System")
 
     def systemValue(self, sysValueKey):
         try:
-            return self._system.get(sysValueKey)
+            return self._peekSection("System").get(sysValueKey)
         except KeyError:
             return None
 
     @property
     def cloud(self):
-        return self._cloud
+        return self._section("Cloud")
 
     @property
     def capability(self):
-        return self._capability
+        return self._section("DeviceCapabilityMatrix")
 
     @property
     def heating(self):
-        return self._heating
+        return self._section("HeatingChannel")
 
     @property
     def hotwater(self):
-        return self._hotwater
+        return self._section("HotWater")
 
     @property
     def devices(self):
-        return self._devices
+        return self._section("Device")
 
     def device(self, deviceId):
-        for device in self._devices:
-            if device.get("id") == deviceId:
-                return device
+        return self._get("Device", deviceId)
 
     def deviceRoom(self, deviceId):
+        self._checkSection("Room")
         try:
-            return self._device2roomMap[deviceId]
+            return self._snapshot.device2roomMap[deviceId]
         except KeyError:
             return None
 
     @property
     def rooms(self):
         """Gets Room Data as JSON Payload"""
-        return self._rooms
+        return self._section("Room")
 
     def room(self, roomId):
         """Convinience to get data on a single room"""
-        for room in self._rooms:
-            if room.get("id") == roomId:
-                return room
+        return self._get("Room", roomId)
 
     @property
     def thermostats(self):
-        return self._thermostats
+        return self._section("SmartValve")
 
     def thermostat(self, thermostatId):
-        for thermostat in self._thermostats:
-            if thermostat.get("id") == thermostatId:
-                return thermostat
+        return self._get("SmartValve", thermostatId)
 
     @property
     def roomStats(self):
-        return self._roomstats
+        return self._section("RoomStat")
 
     def roomStat(self, roomstatId):
-        for roomstat in self._roomstats:
-            if roomstat.get("id") == roomstatId:
-                return roomstat
+        return self._get("RoomStat", roomstatId)
 
     @property
     def schedules(self):
-        return self._schedules
+        return self._section("Schedule")
 
     def schedule(self, scheduleId):
-        for schedule in self._schedules:
-            if schedule.get("id") == scheduleId:
-                return schedule
+        return self._get("Schedule", scheduleId)
 
     def roomSchedule(self, roomId):
-        if self.room(roomId):
-            return self.schedule(self.room(roomId).get("ScheduleId"))
+        room = self._peek("Room", roomId)
+        if room:
+            return self._peek("Schedule", room.get("ScheduleId"))
+
+    def compiledSchedule(self, scheduleId):
+        """
+        Gets a schedule compiled for time queries
+        param scheduleId: The schedule id
+        return: wiserSchedule or None
+        """
+        self._checkSection("Schedule")
+        return self._snapshot.scheduleIndex.get(scheduleId)
+
+    def roomScheduledSetPoint(self, roomId, when=None):
+        """
+        Gets the set point a room's schedule gives at a time
+        param roomId: The room id
+        param when: Hub local datetime, defaults to now
+        return: Degrees or None if the room has no schedule
+        """
+        room = self._peek("Room", roomId)
+        schedule = self.compiledSchedule(room.get("ScheduleId")) if room else None
+        return schedule.valueAt(when) if schedule else None
+
+    def roomNextScheduleChange(self, roomId, when=None):
+        """
+        Gets the next transition in a room's schedule
+        param roomId: The room id
+        param when: Hub local datetime, defaults to now
+        return: Tuple of (datetime, degrees) or None if the room has no schedule
+        """
+        room = self._peek("Room", roomId)
+        schedule = self.compiledSchedule(room.get("ScheduleId")) if room else None
+        return schedule.nextTransition(when) if schedule else None
+
+    def roomsChangingWithin(self, minutes, when=None):
+        """
+        Gets the rooms whose schedule changes set point in the next minutes
+        param minutes: Window length, at most a week
+        param when: Hub local datetime, defaults to now
+        return: List of dicts with roomId, roomName, time and setPoint in time order
+        """
+        self._checkSection("Schedule")
+        roomsBySchedule = {}
+        for room in self._peekSection("Room"):
+            roomsBySchedule.setdefault(room.get("ScheduleId"), []).append(room)
+        changes = []
+        for changeTime, scheduleId, setPoint in self._snapshot.scheduleIndex.transitionsWithin(
+            minutes, when
+        ):
+            for room in roomsBySchedule.get(scheduleId, []):
+                changes.append(
+                    {
+                        "roomId": room.get("id"),
+                        "roomName": room.get("Name"),
+                        "time": changeTime,
+                        "setPoint": setPoint,
+                    }
+                )
+        return changes
 
     @property
     def smartPlugs(self):
-        return self._smartplugs
+        return self._section("SmartPlug")
 
     def smartPlug(self, smartplugId):
-        for smartplug in self._smartplugs:
-            if smartplug.get("id") == smartplugId:
-                return smartplug
-                
+        return self._get("SmartPlug", smartplugId)
+
     def smartPlugMode(self, smartplugId):
-        for smartplug in self._smartplugs:
-            if smartplug.get("id") == smartplugId:
-                return smartplug.get("Mode")
+        smartplug = self._peek("SmartPlug", smartplugId)
+        if smartplug is not None:
+            return smartplug.get("Mode")
 
     @property
     def relayNodes(self):
-        return self._nodeMap
+        """Relay nodes, built from the Device and SmartPlug sections"""
+        self._checkSection("Device")
+        self._checkSection("SmartPlug")
+        return self._snapshot.nodeMap
 
     def deviceParentNode(self, deviceId):
-        if self.device(deviceId):
-            return self._nodeMap[self.device(deviceId).get("ParentNodeId")]
-            
+        """
+        Gets the relay node a device connects through
+        param deviceId: The device id
+        return: Dict, or None if the device or its parent is not known, which includes
+            before the Device and SmartPlug sections are fetched
+        """
+        nodeMap = self.relayNodes
+        device = self._peek("Device", deviceId)
+        if device:
+            return nodeMap.get(device.get("ParentNodeId"))
 
     def heatingRelayStatus(self, heatingChannelId=1):
         # There could be multiple heating channels,
-        for heatingChannel in self._heating:
-            if heatingChannel.get("id") == heatingChannelId:
-                return heatingChannel.get("HeatingRelayState")
+        heatingChannel = self._peek("HeatingChannel", heatingChannelId)
+        if heatingChannel is not None:
+            return heatingChannel.get("HeatingRelayState")
 
     @property
     def hotwaterRelayStatus(self):
         try:
-            return self._hotwater[0].get("WaterHeatingState")
-        except KeyError:
+            return self._peekSection("HotWater")[0].get("WaterHeatingState")
+        except (KeyError, IndexError):
             return None
 
     def roomSetPoint(self, roomId):
-        room = self.room(roomId)
+        room = self._peek("Room", roomId)
         if room is not None:
             return room.get("DisplayedSetPoint")
 
     def roomTemperature(self, roomId):
-        room = self.room(roomId)
+        room = self._peek("Room", roomId)
         if room is not None:
             return room.get("CalculatedTemperature")
 
@@ -418,8 +1809,10 @@ class wiserHub:
           Switch Hot Water on or off manually, or reset to 'Auto' (schedule).
           'mode' can be "on", "off" or "auto".
         """
+        await self._asyncEnsureSections("HotWater")
+        hotwater = self._peekSection("HotWater")
         #Test if function available on this hub
-        if self.hotwater:
+        if hotwater:
             HWmodeMapping = {
                 "on": {
                     "RequestOverride": {
@@ -446,7 +1839,7 @@ class wiserHub:
             try:
                 await self.request(
                     "patch",
-                    path=WISERHOTWATER.format(self._hotwater[0].get("id")),
+                    path=WISERHOTWATER.format(hotwater[0].get("id")),
                     json=HWmodeMapping.get(mode.lower()),
                 )
                 return True
@@ -470,8 +1863,8 @@ class wiserHub:
         :param mode: Value of mode
         :return:
         """
-
-        if switch not in self.system:
+        await self._asyncEnsureSections("System")
+        if switch not in self._peekSection("System"):
             raise WiserException(
                     "InvalidSwitch",
                     "System switch {} does not exist on your hub.".format(switch)
@@ -493,15 +1886,16 @@ class wiserHub:
         Sets Room Schedule
 
         param roomId:
-        param scheduleData: json data for schedule
+        param scheduleData: json data for schedule, keys the hub does not take are left out
         return:
         """
-        scheduleId = self.room(roomId).get("ScheduleId")
+        await self._asyncEnsureSections("Room")
+        scheduleId = (self._peek("Room", roomId) or {}).get("ScheduleId")
 
         if scheduleId is not None:
             try:
                 await self.request(
-                    "patch", path=WISERSCHEDULE.format(scheduleId), json=scheduleData
+                    "patch", path=WISERSCHEDULE.format(scheduleId), json=writableSchedule(scheduleData)
                 )
                 return True
             except WiserHubException as ex:
@@ -525,19 +1919,12 @@ class wiserHub:
         param scheduleData: json data for schedule
         return:
         """
-        scheduleId = self.room(roomId).get("ScheduleId")
-        scheduleData = ""
+        await self._asyncEnsureSections("Room")
+        scheduleId = (self._peek("Room", roomId) or {}).get("ScheduleId")
 
         if scheduleId is not None:
             if os.path.exists(scheduleFile):
-                try:
-                    async with aiofiles.open(scheduleFile, "r") as f:
-                        scheduleData = await f.read()
-                        await json.loads(scheduleData)
-                except:
-                    raise WiserException(
-                            "ErrorReadingFile",
-                            "Error reading file - {}".format(scheduleFile))
+                scheduleData = await self.asyncReadScheduleFile(scheduleFile)
                 await self.asyncSetRoomSchedule(roomId, scheduleData)
                 return True
             else:
@@ -552,6 +1939,145 @@ class wiserHub:
                     "NoScheduleFoundForRoom",
                     "No schedule found that matches roomId")
 
+    @staticmethod
+    async def asyncReadScheduleFile(scheduleFile):
+        """
+        Reads and validates a schedule json file
+        param scheduleFile: Path of the file
+        return: Schedule dict
+        """
+        try:
+            async with aiofiles.open(scheduleFile, "r") as f:
+                scheduleData = json.loads(await f.read())
+        except (OSError, ValueError) as ex:
+            _LOGGER.debug("Error reading schedule file {}.  Error {}".format(scheduleFile, ex))
+            raise WiserException(
+                    "ErrorReadingFile",
+                    "Error reading file - {}".format(scheduleFile))
+        problems = validateSchedule(scheduleData)
+        if problems:
+            raise WiserException(
+                    "InvalidSchedule",
+                    "Invalid schedule in {} - {}".format(scheduleFile, "; ".join(problems)))
+        return scheduleData
+
+    @staticmethod
+    async def asyncReadScheduleDirectory(directory, pattern=SCHEDULE_FILE_PATTERN):
+        """
+        Reads and validates all the schedule files in a directory at once.  Files are
+        named after the room they are for, by room id or room name, such as 3.json or
+        Lounge.json.
+        param directory: Directory of schedule files
+        param pattern: Glob pattern of the files to read
+        return: Dict of file name without extension to the schedule dict, or the
+            WiserException for a file that could not be read
+        """
+        if not os.path.isdir(directory):
+            raise WiserException(
+                    "FileNotFound",
+                    "Schedule directory, {}, not found.".format(os.path.abspath(directory)))
+        scheduleFiles = sorted(glob.glob(os.path.join(directory, pattern)))
+        results = await asyncio.gather(
+            *[wiserHub.asyncReadScheduleFile(scheduleFile) for scheduleFile in scheduleFiles],
+            return_exceptions=True,
+        )
+        schedules = {}
+        for scheduleFile, result in zip(scheduleFiles, results):
+            if isinstance(result, BaseException) and not isinstance(result, WiserException):
+                raise result
+            schedules[os.path.splitext(os.path.basename(scheduleFile))[0]] = result
+        return schedules
+
+    def _findRoom(self, roomKey):
+        """
+        Finds a room by id, or by name ignoring case
+        param roomKey: Room id, or room name or id as a string
+        return: Room dict or None
+        """
+        if isinstance(roomKey, int) or str(roomKey).isdigit():
+            return self._peek("Room", int(roomKey))
+        for room in self._peekSection("Room"):
+            if str(room.get("Name", "")).lower() == str(roomKey).lower():
+                return room
+        return None
+
+    def _scheduleChanged(self, scheduleId, scheduleData):
+        """
+        Checks if schedule data differs from the cached schedule.  Only the days in the
+        data are compared, as the hub keeps days a PATCH leaves out.
+        """
+        current = self._peek("Schedule", scheduleId) or {}
+        return any(
+            current.get(key) != value for key, value in writableSchedule(scheduleData).items()
+        )
+
+    async def asyncSetRoomSchedules(self, schedules):
+        """
+        Sets the schedules of many rooms, sending only those that differ from the
+        hub's current schedules.  Every schedule is checked before any is sent and a
+        failure for one room does not stop the others.  Keys that are the same room, such
+        as its id and its name, are all rejected.
+        param schedules: Dict of room id or room name to schedule dict
+        return: Dict of the same keys to True if sent, False if already up to date, or
+            the WiserException for that room
+        """
+        await self._asyncEnsureSections("Room", "Schedule")
+        results = {}
+        items = {}
+        roomKeys = {}
+        rooms = {roomKey: self._findRoom(roomKey) for roomKey in schedules}
+        duplicates = self._duplicateIds(
+            [(room.get("id"),) for room in rooms.values() if room is not None]
+        )
+        for roomKey, scheduleData in schedules.items():
+            room = rooms[roomKey]
+            if isinstance(scheduleData, WiserException):
+                results[roomKey] = scheduleData
+                continue
+            problems = validateSchedule(scheduleData)
+            if room is None:
+                results[roomKey] = WiserException(
+                    "InvalidRoom",
+                    "Room {} does not exist".format(roomKey))
+            elif room.get("id") in duplicates:
+                results[roomKey] = WiserException(
+                    "DuplicateRoom",
+                    "More than one schedule given for room {}".format(roomKey))
+            elif room.get("ScheduleId") is None:
+                results[roomKey] = WiserException(
+                    "NoScheduleFoundForRoom",
+                    "No schedule found that matches roomId")
+            elif problems:
+                results[roomKey] = WiserException(
+                    "InvalidSchedule",
+                    "Invalid schedule for room {} - {}".format(roomKey, "; ".join(problems)))
+            elif not self._scheduleChanged(room.get("ScheduleId"), scheduleData):
+                results[roomKey] = False
+            else:
+                items[room.get("id")] = (scheduleData,)
+                roomKeys[room.get("id")] = roomKey
+        _LOGGER.debug(
+            "Sending {} of {} schedules, the rest are unchanged or invalid".format(
+                len(items), len(schedules)
+            )
+        )
+        sent = await self._asyncBulkSet(items, self.asyncSetRoomSchedule)
+        for roomId, result in sent.items():
+            results[roomKeys[roomId]] = result
+        return results
+
+    async def asyncSetRoomSchedulesFromDirectory(self, directory, pattern=SCHEDULE_FILE_PATTERN):
+        """
+        Sets room schedules from a directory of schedule files, see
+        asyncReadScheduleDirectory.  Only schedules that differ from the hub's are sent.
+        param directory: Directory of schedule files
+        param pattern: Glob pattern of the files to read
+        return: Dict of file name without extension to True if sent, False if already
+            up to date, or the WiserException for that file
+        """
+        schedules = await self.asyncReadScheduleDirectory(directory, pattern)
+        return await self.asyncSetRoomSchedules(schedules)
+
     async def asyncCopyRoomSchedule(self, fromRoomId, toRoomId):
         """
         Copies Room Schedule from one room to another
@@ -560,6 +2086,7 @@ class wiserHub:
         param toRoomId:
         return: boolean
         """
+        await self._asyncEnsureSections("Room", "Schedule")
         scheduleData = self.roomSchedule(fromRoomId)
         if scheduleData != None:
             await self.asyncSetRoomSchedule(toRoomId, scheduleData)
@@ -579,17 +2106,17 @@ class wiserHub:
         param boost_temp:  If boosting enter the temperature here in C, can be between 5-30
         param boost_temp_time:  How long to boost for in minutes
         """
+        await self._asyncEnsureSections("Room")
         mode = mode.lower()
-        if self.room(roomId) is None:
+        room = self._peek("Room", roomId)
+        if room is None:
             raise WiserException(
                     "InvalidRoom",
                     "Room {} does not exist".format(roomId))
         if mode == "manual":
-            temperature = self._fromWiserTemp(self.room(roomId).get("CurrentSetPoint"))
+            temperature = self._fromWiserTemp(room.get("CurrentSetPoint"))
             if temperature == TEMP_OFF:
-                temperature = self._fromWiserTemp(
-                    self.room(roomId).get("ScheduledSetPoint")
-                )
+                temperature = self._fromWiserTemp(room.get("ScheduledSetPoint"))
                 mode = "manual_set"
             # If temp is less than 5C then set to min temp
             if temperature < TEMP_MINIMUM:
@@ -650,20 +2177,26 @@ class wiserHub:
                 roomId, mode.lower(), temperature, roomModeMapping.get(mode.lower())
             )
         )
+        patchData = roomModeMapping.get(mode)
         try:
             if mode != "boost":
-                # Cancel boost
-                await self.request(
-                    "patch",
-                    path=WISERROOM.format(roomId),
-                    json=roomModeMapping.get("cancelboost"),
-                )
+                if "RequestOverride" in patchData:
+                    # The mode sets its own override, which would replace the cancel if
+                    # merged into one request, so cancel boost first
+                    await self.request(
+                        "patch",
+                        path=WISERROOM.format(roomId),
+                        json=roomModeMapping.get("cancelboost"),
+                    )
+                else:
+                    # Cancel boost in the same request
+                    patchData = dict(roomModeMapping.get("cancelboost"), **patchData)
             await self.request(
-                "patch", path=WISERROOM.format(roomId), json=roomModeMapping.get(mode)
+                "patch", path=WISERROOM.format(roomId), json=patchData
             )
             return True
         except WiserHubException as ex:
-            if ex.status == 404:
+            if ex.status == "InvalidAPICall":
                 _LOGGER.debug("Set room mode, room not found error ")
                 raise WiserException(
                     "InvalidDevice",
@@ -709,7 +2242,7 @@ class wiserHub:
             )
             return True
         except WiserHubException as ex:
-            if ex.status == 404:
+            if ex.status == "InvalidAPICall":
                 _LOGGER.debug("Set room temperature, room not found error ")
                 raise WiserException(
                     "InvalidDevice",
@@ -739,7 +2272,8 @@ class wiserHub:
             raise WiserException(
                 "InvalidMode",
                 "SmartPlug State must be either On or Off")
-        if self.smartPlug(smartPlugId) is None:
+        await self._asyncEnsureSections("SmartPlug")
+        if self._peek("SmartPlug", smartPlugId) is None:
             raise WiserException(
                 "InvalidDevice",
                 "Smartplug {} does not exist".format(smartPlugId)
@@ -755,7 +2289,7 @@ class wiserHub:
             )
             return True
         except WiserHubException as ex:
-            if ex.status == 404:
+            if ex.status == "InvalidAPICall":
                 _LOGGER.debug("Set smart plug not found error ")
                 raise WiserException(
                     "InvalidDevice",
@@ -793,7 +2327,7 @@ class wiserHub:
             )
             return True
         except WiserHubException as ex:
-            if ex.status == 404:
+            if ex.status == "InvalidAPICall":
                 _LOGGER.debug("Set smart plug not found error ")
                 raise WiserException(
                     "InvalidDevice",
@@ -811,3 +2345,149 @@ class wiserHub:
                         smartPlugId, smartPlugMode.lower(), ex.status, ex.message
                     )
                 )
+
+    async def _asyncBulkSet(self, items, setter):
+        """
+        Runs a set function for many items at once.  The writes share one coalesce window
+        and the hub write_concurrency limits how many are sent at a time.
+        param items: Dict of entity id to a tuple of setter arguments after the id
+        param setter: Set coroutine function taking the entity id then the arguments
+        return: Dict of entity id to True or the WiserException it raised
+        """
+        async def setOne(entityId, args):
+            try:
+                return await setter(entityId, *args)
+            except WiserException as ex:
+                return ex
+
+        results = await asyncio.gather(
+            *[setOne(entityId, args) for entityId, args in items.items()]
+        )
+        return dict(zip(items, results))
+
+    def _bulkItems(self, items):
+        """
+        Gets the (id, values...) items of a bulk set as a list of tuples
+        param items: Dict of id to value, or iterable of (id, value) pairs
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        return [tuple(item) for item in items]
+
+    def _duplicateIds(self, items):
+        """
+        Gets the ids given more than once in bulk set items.  Results are keyed by id so
+        only one result could be returned for them, and none of their writes are sent.
+        param items: List of (id, values...) tuples
+        return: Set of ids
+        """
+        seen = set()
+        duplicates = set()
+        for item in items:
+            if item[0] in seen:
+                duplicates.add(item[0])
+            seen.add(item[0])
+        return duplicates
+
+    async def asyncSetRoomTemperatures(self, temperatures):
+        """
+        Sets the temperature of many rooms.  Every temperature is checked before any
+        write is sent, and a failure for one room does not stop the others.
+        param temperatures: Dict of room id to temperature, or iterable of (roomId, temperature)
+        return: Dict of room id to True or the WiserException for that room
+        """
+        await self._asyncEnsureSections("Room")
+        results = {}
+        items = {}
+        bulkItems = self._bulkItems(temperatures)
+        duplicates = self._duplicateIds(bulkItems)
+        for roomId, temperature in bulkItems:
+            if roomId in duplicates:
+                results[roomId] = WiserException(
+                    "DuplicateRoom",
+                    "More than one temperature given for room {}".format(roomId))
+            elif self._peek("Room", roomId) is None:
+                results[roomId] = WiserException(
+                    "InvalidRoom",
+                    "Room {} does not exist".format(roomId))
+            elif not self._checkTempRange(temperature):
+                results[roomId] = WiserException(
+                    "InvalidTemp",
+                    "Temperature is set to {}. Temperature can only be between {} and {}.".format(
+                        temperature, TEMP_MINIMUM, TEMP_MAXIMUM
+                    )
+                )
+            else:
+                items[roomId] = (temperature,)
+        results.update(await self._asyncBulkSet(items, self.asyncSetRoomTemperature))
+        return results
+
+    async def asyncSetRoomModes(self, modes):
+        """
+        Sets the mode of many rooms.  Every mode and boost temperature is checked before
+        any write is sent, and a failure for one room does not stop the others.
+        param modes: Dict of room id to mode, or iterable of (roomId, mode) or
+            (roomId, mode, temperature) with the temperature used for boost
+        return: Dict of room id to True or the WiserException for that room
+        """
+        await self._asyncEnsureSections("Room")
+        results = {}
+        items = {}
+        bulkItems = self._bulkItems(modes)
+        duplicates = self._duplicateIds(bulkItems)
+        for item in bulkItems:
+            roomId, mode = item[0], item[1].lower()
+            args = (mode,) + item[2:]
+            if roomId in duplicates:
+                results[roomId] = WiserException(
+                    "DuplicateRoom",
+                    "More than one mode given for room {}".format(roomId))
+            elif self._peek("Room", roomId) is None:
+                results[roomId] = WiserException(
+                    "InvalidRoom",
+                    "Room {} does not exist".format(roomId))
+            elif mode not in ROOM_MODES:
+                results[roomId] = WiserException(
+                    "InvalidMode",
+                    "Mode {} is not valid.  Modes are auto, boost, manual and off".format(mode))
+            elif mode == "boost" and len(item) > 2 and not self._checkTempRange(item[2]):
+                results[roomId] = WiserException(
+                    "InvalidTemp",
+                    "Temperature is set to {}. Temperature can only be between {} and {}.".format(
+                        item[2], TEMP_MINIMUM, TEMP_MAXIMUM
+                    )
+                )
+            else:
+                items[roomId] = args
+        results.update(await self._asyncBulkSet(items, self.asyncSetRoomMode))
+        return results
+
+    async def asyncSetSmartPlugStates(self, states):
+        """
+        Switches many smart plugs on or off.  Every state is checked before any write
+        is sent, and a failure for one plug does not stop the others.
+        param states: Dict of smart plug id to On or Off, or iterable of (smartPlugId, state)
+        return: Dict of smart plug id to True or the WiserException for that plug
+        """
+        await self._asyncEnsureSections("SmartPlug")
+        results = {}
+        items = {}
+        bulkItems = self._bulkItems(states)
+        duplicates = self._duplicateIds(bulkItems)
+        for smartPlugId, smartPlugState in bulkItems:
+            if smartPlugId in duplicates:
+                results[smartPlugId] = WiserException(
+                    "DuplicateDevice",
+                    "More than one state given for smartplug {}".format(smartPlugId))
+            elif str(smartPlugState).lower() not in ["on", "off"]:
+                results[smartPlugId] = WiserException(
+                    "InvalidMode",
+                    "SmartPlug State must be either On or Off")
+            elif self._peek("SmartPlug", smartPlugId) is None:
+                results[smartPlugId] = WiserException(
+                    "InvalidDevice",
+                    "Smartplug {} does not exist".format(smartPlugId))
+            else:
+                items[smartPlugId] = (smartPlugState,)
+        results.update(await self._asyncBulkSet(items, self.asyncSetSmartPlugState))
+        return results
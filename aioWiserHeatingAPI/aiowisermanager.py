@@ -0,0 +1,271 @@
+"""
+# Wiser Hub Manager
+
+Polls many Wiser Hubs from one event loop.  All hubs share a single connection pool,
+polls run with a bounded concurrency and each hub is polled on its own adaptive
+schedule.  Errors are recorded per hub so one slow or dead hub does not stall the others.
+"""
+import aiohttp
+import asyncio
+import logging
+
+from .aiowiserhub import (
+    wiserHub,
+    WiserException,
+    CONNECTION_LIMIT,
+    KEEPALIVE_TIMEOUT,
+)
+from .aiowiserscheduler import wiserPollScheduler, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_INTERVAL = 30
+MAX_CONCURRENT_POLLS = 20
+TOTAL_CONNECTION_LIMIT = 100
+
+
+class wiserHubManager:
+    """
+    Manages a collection of Wiser Hubs keyed by host
+    """
+
+    def __init__(
+        self,
+        session=None,
+        poll_interval=POLL_INTERVAL,
+        min_poll_interval=MIN_POLL_INTERVAL,
+        max_poll_interval=MAX_POLL_INTERVAL,
+        max_concurrent_polls=MAX_CONCURRENT_POLLS,
+        connection_limit=CONNECTION_LIMIT,
+        total_connection_limit=TOTAL_CONNECTION_LIMIT,
+    ):
+        """
+        param session: Optional aiohttp ClientSession shared by all hubs.  If not given
+            the manager creates and owns one.
+        param poll_interval: Default starting seconds between polls of each hub.  Each hub's
+            scheduler then adapts it between min_poll_interval and max_poll_interval.
+        param min_poll_interval: Default fastest poll interval, used after writes and changes
+        param max_poll_interval: Default slowest poll interval while nothing is changing
+        param max_concurrent_polls: Max number of hubs being polled at the same time
+        param connection_limit: Max simultaneous connections to any one hub
+        param total_connection_limit: Max simultaneous connections across all hubs
+        """
+        self._session = session
+        self._ownSession = session is None
+        self._pollInterval = poll_interval
+        self._minPollInterval = min_poll_interval
+        self._maxPollInterval = max_poll_interval
+        self._maxConcurrentPolls = max_concurrent_polls
+        self._connectionLimit = connection_limit
+        self._totalConnectionLimit = total_connection_limit
+        self._pollSemaphore = None
+        self._running = False
+        self._hubs = {}
+        self._hubErrors = {}
+        self._hubSchedulers = {}
+        self._hubTasks = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _getSession(self):
+        """
+        Gets the shared http session, creating it on first use
+        return: aiohttp.ClientSession
+        """
+        if self._session is None or (self._ownSession and self._session.closed):
+            connector = aiohttp.TCPConnector(
+                limit=self._totalConnectionLimit,
+                limit_per_host=self._connectionLimit,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _getPollSemaphore(self):
+        if self._pollSemaphore is None:
+            self._pollSemaphore = asyncio.Semaphore(self._maxConcurrentPolls)
+        return self._pollSemaphore
+
+    def addHub(
+        self,
+        host,
+        api_key,
+        poll_interval=None,
+        min_poll_interval=None,
+        max_poll_interval=None,
+        **hub_options
+    ):
+        """
+        Adds a hub to the manager.  Must be called from within the event loop.
+        param host: Hub host name or ip address
+        param api_key: Hub secret key
+        param poll_interval: Starting seconds between polls of this hub, defaults to the
+            manager interval.  Polls speed up to min_poll_interval while the hub data is
+            changing or after writes, and slow down to max_poll_interval while it is not.
+        param min_poll_interval: Fastest poll interval, defaults to the manager's
+        param max_poll_interval: Slowest poll interval, defaults to the manager's
+        param hub_options: Other wiserHub arguments, such as refresh_policy, sections,
+            cache_file, retries or entity_model.  The hub always uses the manager's session.
+        return: wiserHub
+        """
+        if host in self._hubs:
+            raise WiserException("HubExists", "Hub {} is already managed".format(host))
+        if "session" in hub_options:
+            raise WiserException(
+                "InvalidOption",
+                "Managed hubs share the manager session, session cannot be set per hub"
+            )
+        # Hubs size their requests to the connections they get from the shared session
+        hub_options.setdefault("connection_limit", self._connectionLimit)
+        hub = wiserHub(host, api_key, session=self._getSession(), **hub_options)
+        self._hubs[host] = hub
+        self._hubErrors[host] = None
+        scheduler = wiserPollScheduler(
+            interval=poll_interval or self._pollInterval,
+            min_interval=min_poll_interval or self._minPollInterval,
+            max_interval=max_poll_interval or self._maxPollInterval,
+        )
+        self._hubSchedulers[host] = scheduler
+        if self._running:
+            self._startPolling(host)
+        return hub
+
+    async def removeHub(self, host):
+        """
+        Stops polling and removes a hub from the manager
+        param host: Hub host name or ip address
+        """
+        task = self._hubTasks.pop(host, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        hub = self._hubs.pop(host, None)
+        self._hubErrors.pop(host, None)
+        self._hubSchedulers.pop(host, None)
+        if hub is not None:
+            await hub.close()
+
+    def hub(self, host):
+        return self._hubs.get(host)
+
+    @property
+    def hubs(self):
+        return self._hubs
+
+    def scheduler(self, host):
+        """
+        Gets the poll scheduler for a hub
+        param host: Hub host name or ip address
+        return: wiserPollScheduler
+        """
+        return self._hubSchedulers.get(host)
+
+    def lastError(self, host):
+        """
+        Gets the error from the last poll of a hub
+        param host: Hub host name or ip address
+        return: WiserException or None if the last poll succeeded
+        """
+        return self._hubErrors.get(host)
+
+    @property
+    def failedHubs(self):
+        """Hosts whose last poll failed"""
+        return [host for host, error in self._hubErrors.items() if error is not None]
+
+    async def asyncPollHub(self, host):
+        """
+        Polls one hub, waiting for a free poll slot.  Errors are recorded against the
+        hub rather than raised, and the hub's scheduler backs off for those that mean
+        the hub is down.
+        param host: Hub host name or ip address
+        return: Boolean
+        """
+        hub = self._hubs[host]
+        scheduler = self._hubSchedulers[host]
+        async with self._getPollSemaphore():
+            try:
+                result = await scheduler.asyncPoll(hub)
+                self._hubErrors[host] = None
+                return bool(result)
+            except WiserException as ex:
+                self._hubErrors[host] = ex
+            except Exception as ex:
+                _LOGGER.error("Unexpected error polling Wiser Hub {}, error {}".format(host, ex))
+                self._hubErrors[host] = WiserException("PollError", str(ex))
+            return False
+
+    async def asyncPollAll(self):
+        """
+        Polls every hub once with bounded concurrency
+        return: Dict of host to Boolean poll result
+        """
+        hosts = list(self._hubs)
+        results = await asyncio.gather(*[self.asyncPollHub(host) for host in hosts])
+        return dict(zip(hosts, results))
+
+    async def asyncSetRoomSchedulesFromDirectory(self, directory, hosts=None):
+        """
+        Deploys a directory of schedule files to many hubs.  The files are read once and
+        each hub is only sent the schedules that differ from its own.
+        param directory: Directory of schedule files, see wiserHub.asyncReadScheduleDirectory
+        param hosts: Hosts to deploy to, defaults to every hub
+        return: Dict of host to the hub's per file results, or the WiserException for a
+            hub that could not be updated
+        """
+        schedules = await wiserHub.asyncReadScheduleDirectory(directory)
+        hosts = list(self._hubs) if hosts is None else hosts
+
+        async def deploy(host):
+            try:
+                return await self._hubs[host].asyncSetRoomSchedules(schedules)
+            except WiserException as ex:
+                _LOGGER.debug(
+                    "Error deploying schedules to Wiser Hub {}, error {} {}".format(
+                        host, ex.status, ex.message
+                    )
+                )
+                return ex
+
+        results = await asyncio.gather(*[deploy(host) for host in hosts])
+        return dict(zip(hosts, results))
+
+    def _startPolling(self, host):
+        scheduler = self._hubSchedulers[host]
+        self._hubTasks[host] = asyncio.ensure_future(
+            scheduler.run(self._hubs[host], poll=lambda: self.asyncPollHub(host))
+        )
+
+    def start(self):
+        """
+        Starts background polling of all hubs.  Must be called from within the event loop.
+        """
+        if self._running:
+            return
+        self._running = True
+        for host in self._hubs:
+            self._startPolling(host)
+
+    async def stop(self):
+        """Stops background polling"""
+        self._running = False
+        tasks = list(self._hubTasks.values())
+        self._hubTasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        """
+        Stops polling, closes all hubs and the shared session if it is owned by the manager
+        """
+        await self.stop()
+        for hub in self._hubs.values():
+            await hub.close()
+        if self._ownSession and self._session is not None:
+            await self._session.close()
+            self._session = None
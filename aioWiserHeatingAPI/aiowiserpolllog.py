@@ -0,0 +1,396 @@
+"""
+# Wiser Poll Log
+
+Append only archive of every refresh from one or many hubs.  Each entity in each
+refresh is one fixed width record of little endian numeric columns, so the file can
+be memory mapped and each column read as a strided view without parsing or copying.
+Strings, such as hub hosts, entity types and modes, are stored once in a sidecar
+dictionary file and referenced by index.
+
+    log = wiserPollLog("wiser.plog")
+    log.attach(hub)
+    ...
+    with wiserPollLogReader("wiser.plog") as reader:
+        times, temperatures = reader.series(hub.host, "Room", 1, "temperature")
+
+Records are written in time order, so time ranges are found by binary search.
+"""
+import aiofiles
+import asyncio
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_LOG_MAGIC = b"WPLOG001"
+# Magic then record size, padded to 16 bytes
+POLL_LOG_HEADER = struct.Struct("<8sI4x")
+POLL_LOG_STRINGS_SUFFIX = ".strings"
+
+# Record columns as (name, struct format, numpy dtype).  Strings are dictionary
+# indexes with 0 for none, missing numbers are NaN.
+POLL_LOG_COLUMNS = [
+    ("time", "d", "<f8"),
+    ("hub", "I", "<u4"),
+    ("entityId", "I", "<u4"),
+    ("entityType", "H", "<u2"),
+    ("state", "H", "<u2"),
+    ("temperature", "f", "<f4"),
+    ("setPoint", "f", "<f4"),
+    ("demand", "f", "<f4"),
+    ("signal", "f", "<f4"),
+    ("battery", "f", "<f4"),
+]
+POLL_LOG_RECORD = struct.Struct("<" + "".join(column[1] for column in POLL_LOG_COLUMNS))
+
+# Values logged for each entity type as column to (hub field or tuple of nested fields,
+# value is in tenths).  state is logged through the string dictionary.
+POLL_LOG_FIELDS = {
+    "Room": {
+        "temperature": ("CalculatedTemperature", True),
+        "setPoint": ("CurrentSetPoint", True),
+        "demand": ("PercentageDemand", False),
+        "state": ("Mode", False),
+    },
+    "SmartValve": {
+        "temperature": ("MeasuredTemperature", True),
+        "setPoint": ("SetPoint", True),
+        "demand": ("PercentageDemand", False),
+    },
+    "RoomStat": {
+        "temperature": ("MeasuredTemperature", True),
+        "setPoint": ("SetPoint", True),
+    },
+    "HeatingChannel": {
+        "demand": ("PercentageDemand", False),
+        "state": ("HeatingRelayState", False),
+    },
+    "SmartPlug": {
+        "state": ("OutputState", False),
+    },
+    "Device": {
+        "signal": (("ReceptionOfDevice", "Rssi"), False),
+        "battery": ("BatteryVoltage", True),
+        "state": ("DisplayedSignalStrength", False),
+    },
+}
+
+NAN = float("nan")
+
+
+def _fieldValue(entity, field):
+    if isinstance(field, tuple):
+        value = entity
+        for part in field:
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    return entity.get(field)
+
+
+class wiserPollLog:
+    """
+    Appends hub refreshes to a poll log file
+    """
+
+    def __init__(self, path, fields=POLL_LOG_FIELDS):
+        """
+        param path: Log file path, created if it does not exist
+        param fields: Dict of entity type to the columns logged for it, see POLL_LOG_FIELDS
+        """
+        self._path = path
+        self._fields = fields
+        self._stringsPath = path + POLL_LOG_STRINGS_SUFFIX
+        self._strings = {}
+        self._lastTime = -math.inf
+        self._lock = None
+        self._open()
+
+    @property
+    def path(self):
+        return self._path
+
+    def _open(self):
+        """Creates the log, or checks an existing one and loads its string dictionary"""
+        if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+            with open(self._path, "wb") as f:
+                f.write(POLL_LOG_HEADER.pack(POLL_LOG_MAGIC, POLL_LOG_RECORD.size))
+            with open(self._stringsPath, "w", encoding="utf-8"):
+                pass
+            return
+        _readHeader(self._path)
+        for index, string in enumerate(_readStrings(self._stringsPath), 1):
+            self._strings[string] = index
+        size = os.path.getsize(self._path) - POLL_LOG_HEADER.size
+        whole = size - size % POLL_LOG_RECORD.size
+        if whole != size:
+            # A write was cut short, drop the partial record so appends stay aligned
+            _LOGGER.debug("Truncating partial record at the end of poll log {}".format(self._path))
+            with open(self._path, "r+b") as f:
+                f.truncate(POLL_LOG_HEADER.size + whole)
+        if whole:
+            with open(self._path, "rb") as f:
+                f.seek(POLL_LOG_HEADER.size + whole - POLL_LOG_RECORD.size)
+                self._lastTime = POLL_LOG_RECORD.unpack(f.read(POLL_LOG_RECORD.size))[0]
+
+    def _stringIndex(self, string, newStrings):
+        if string is None:
+            return 0
+        string = str(string)
+        index = self._strings.get(string)
+        if index is None:
+            index = self._strings[string] = len(self._strings) + 1
+            newStrings.append(string)
+        return index
+
+    def encode(self, snapshot, host, timestamp=None):
+        """
+        Encodes one refresh as poll log records
+        param snapshot: wiserSnapshot
+        param host: Hub host the snapshot is from
+        param timestamp: Record time, defaults to the snapshot time.  Times are kept in
+            order, so one earlier than the last record is logged at the last record's time.
+        return: Tuple of (record bytes, new dictionary strings)
+        """
+        recordTime = max(timestamp or snapshot.timestamp or time.time(), self._lastTime)
+        newStrings = []
+        hubIndex = self._stringIndex(host, newStrings)
+        records = []
+        for entityType, fields in self._fields.items():
+            typeIndex = self._stringIndex(entityType, newStrings)
+            for entityId, entity in snapshot.indexes.get(entityType, {}).items():
+                values = {"state": 0}
+                for column, (field, tenths) in fields.items():
+                    value = _fieldValue(entity, field)
+                    if column == "state":
+                        values[column] = self._stringIndex(value, newStrings)
+                    elif isinstance(value, (int, float)):
+                        values[column] = value / 10 if tenths else value
+                records.append(
+                    POLL_LOG_RECORD.pack(
+                        recordTime,
+                        hubIndex,
+                        entityId or 0,
+                        typeIndex,
+                        values["state"],
+                        values.get("temperature", NAN),
+                        values.get("setPoint", NAN),
+                        values.get("demand", NAN),
+                        values.get("signal", NAN),
+                        values.get("battery", NAN),
+                    )
+                )
+        self._lastTime = recordTime
+        return b"".join(records), newStrings
+
+    async def record(self, snapshot, host, timestamp=None):
+        """
+        Appends one refresh to the log.  Dictionary strings are written before the
+        records that use them, so a reader never sees an unknown string.
+        param snapshot: wiserSnapshot
+        param host: Hub host the snapshot is from
+        param timestamp: Record time, defaults to the snapshot time
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            records, newStrings = self.encode(snapshot, host, timestamp)
+            if newStrings:
+                async with aiofiles.open(self._stringsPath, "a", encoding="utf-8") as f:
+                    await f.write("".join(json.dumps(string) + "\n" for string in newStrings))
+            if records:
+                async with aiofiles.open(self._path, "ab") as f:
+                    await f.write(records)
+
+    def attach(self, hub):
+        """
+        Logs every refresh of a hub.  Many hubs can be attached to one log.
+        param hub: wiserHub
+        return: Function that detaches the log from the hub
+        """
+        return hub.addRefreshListener(lambda snapshot: self.record(snapshot, hub.host))
+
+
+def _readHeader(path):
+    with open(path, "rb") as f:
+        magic, recordSize = POLL_LOG_HEADER.unpack(f.read(POLL_LOG_HEADER.size))
+    if magic != POLL_LOG_MAGIC or recordSize != POLL_LOG_RECORD.size:
+        raise ValueError("{} is not a poll log in this format".format(path))
+
+
+def _readStrings(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class wiserPollLogReader:
+    """
+    Memory mapped reader of a poll log.  With NumPy, records() returns a structured
+    array view straight onto the mapped file.  Without it records are unpacked as tuples.
+    """
+
+    def __init__(self, path):
+        """
+        param path: Log file path
+        """
+        _readHeader(path)
+        self._path = path
+        self._strings = [None] + _readStrings(path + POLL_LOG_STRINGS_SUFFIX)
+        self._stringIndexes = {string: index for index, string in enumerate(self._strings)}
+        self._file = open(path, "rb")
+        size = os.path.getsize(path) - POLL_LOG_HEADER.size
+        self._count = size // POLL_LOG_RECORD.size
+        self._mmap = None
+        self._records = None
+        if self._count:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if numpy is not None:
+                self._records = numpy.frombuffer(
+                    self._mmap,
+                    dtype=numpy.dtype([(name, dtype) for name, _, dtype in POLL_LOG_COLUMNS]),
+                    count=self._count,
+                    offset=POLL_LOG_HEADER.size,
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._records = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Arrays from records() still use the mapping, it closes when they are freed
+                pass
+            self._mmap = None
+        self._file.close()
+
+    @property
+    def count(self):
+        """Number of records in the log when it was opened"""
+        return self._count
+
+    @property
+    def hubs(self):
+        """Hosts with records in the log"""
+        hubs = self._column("hub")
+        indexes = numpy.unique(hubs).tolist() if self._records is not None else set(hubs)
+        return sorted(self.string(index) for index in indexes)
+
+    def string(self, index):
+        """Gets a dictionary string by index, None for 0"""
+        return self._strings[index]
+
+    def _record(self, index):
+        offset = POLL_LOG_HEADER.size + index * POLL_LOG_RECORD.size
+        return POLL_LOG_RECORD.unpack_from(self._mmap, offset)
+
+    def _column(self, name):
+        if not self._count:
+            return []
+        if self._records is not None:
+            return self._records[name]
+        position = [column[0] for column in POLL_LOG_COLUMNS].index(name)
+        return [self._record(index)[position] for index in range(self._count)]
+
+    def _timeRange(self, start, end):
+        """Gets the record index range for a time window by binary search"""
+        if not self._count:
+            return 0, 0
+        if self._records is not None:
+            times = self._records["time"]
+            first = 0 if start is None else int(numpy.searchsorted(times, start, "left"))
+            last = self._count if end is None else int(numpy.searchsorted(times, end, "right"))
+            return first, last
+        first = 0 if start is None else self._bisectTime(start, False)
+        last = self._count if end is None else self._bisectTime(end, True)
+        return first, last
+
+    def _bisectTime(self, value, right):
+        """Binary search of the time column, as bisect_left or bisect_right"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            recordTime = self._record(middle)[0]
+            if recordTime < value or (right and recordTime == value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=None, end=None, host=None, entityType=None, entityId=None):
+        """
+        Gets the records in a time window, optionally for one hub, entity type or entity
+        param start: Only records at or after this time
+        param end: Only records at or before this time
+        param host: Hub host
+        param entityType: Room, SmartValve, RoomStat, HeatingChannel, SmartPlug or Device
+        param entityId: The entity id
+        return: NumPy structured array, a view onto the file when no filter other than
+            time is given, or a list of record tuples without NumPy
+        """
+        first, last = self._timeRange(start, end)
+        filters = []
+        for column, value in (("hub", host), ("entityType", entityType)):
+            if value is not None:
+                filters.append((column, self._stringIndexes.get(value, -1)))
+        if entityId is not None:
+            filters.append(("entityId", entityId))
+        if self._records is not None:
+            records = self._records[first:last]
+            if filters:
+                mask = numpy.ones(len(records), dtype=bool)
+                for column, value in filters:
+                    mask &= records[column] == value
+                records = records[mask]
+            return records
+        positions = [column[0] for column in POLL_LOG_COLUMNS]
+        filters = [(positions.index(column), value) for column, value in filters]
+        records = []
+        for index in range(first, last):
+            record = self._record(index)
+            if all(record[position] == value for position, value in filters):
+                records.append(record)
+        return records
+
+    def series(self, host, entityType, entityId, column, start=None, end=None):
+        """
+        Gets one column for one entity, oldest first, skipping missing values
+        param column: temperature, setPoint, demand, signal, battery or state.  state
+            values are returned as strings.
+        return: Tuple of (times, values) as NumPy arrays, or lists without NumPy
+        """
+        records = self.records(start, end, host, entityType, entityId)
+        if self._records is not None:
+            times, values = records["time"], records[column]
+            if column == "state":
+                return times, numpy.array([self.string(index) for index in values], dtype=object)
+            keep = ~numpy.isnan(values)
+            return times[keep], values[keep]
+        position = [name for name, _, _ in POLL_LOG_COLUMNS].index(column)
+        times, values = [], []
+        for record in records:
+            value = record[position]
+            if column == "state":
+                value = self.string(value)
+            elif math.isnan(value):
+                continue
+            times.append(record[0])
+            values.append(value)
+        return times, values
@@ -0,0 +1,276 @@
+"""
+# Wiser Schedules
+
+Hub schedules compiled into sorted lists of transitions across the week, so the
+scheduled value at a time, the next transition and the transitions in a time window
+are found by binary search rather than by walking each day's set points.
+
+Times are hub local datetimes.  Heating schedule values are in degrees, on/off
+schedule values are the hub's On and Off states.
+"""
+import bisect
+import datetime
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+
+
+def _weekMinute(when):
+    """Minutes since Monday 00:00 of a datetime"""
+    return when.weekday() * DAY_MINUTES + when.hour * 60 + when.minute
+
+
+def _atWeekMinute(when, minute, after):
+    """
+    Gets the datetime of a week minute relative to a datetime
+    param after: True for the first time after when, False for the last time at or before it
+    """
+    base = when.replace(second=0, microsecond=0)
+    delta = (minute - _weekMinute(when)) % WEEK_MINUTES
+    if after and delta == 0:
+        delta = WEEK_MINUTES
+    elif not after and delta:
+        delta -= WEEK_MINUTES
+    return base + datetime.timedelta(minutes=delta)
+
+
+def fromV2Schedules(data):
+    """
+    Converts the v2 schedules api response to the domain Schedule section format, so
+    both sources can be used the same way.  v2 groups schedules by type and gives each
+    day as parallel lists of times and values rather than a list of set points.
+    param data: Dict of schedule type to list of schedules, or a list of schedules
+    return: List of schedule dicts
+    """
+    if isinstance(data, dict):
+        groups = data.items()
+    else:
+        groups = [(None, data or [])]
+    schedules = []
+    for scheduleType, group in groups:
+        if not isinstance(group, list):
+            continue
+        for schedule in group:
+            converted = {}
+            for key, value in schedule.items():
+                if key in WEEKDAYS and isinstance(value, dict) and "SetPoints" not in value:
+                    valueKey = "DegreesC" if "DegreesC" in value else "State"
+                    value = {
+                        "SetPoints": [
+                            {"Time": int(hubTime), valueKey: setPointValue}
+                            for hubTime, setPointValue in zip(
+                                value.get("Time") or [], value.get(valueKey) or []
+                            )
+                        ]
+                    }
+                converted[key] = value
+            if scheduleType is not None:
+                converted.setdefault("Type", scheduleType)
+            schedules.append(converted)
+    return schedules
+
+
+def validateSchedule(data):
+    """
+    Checks schedule json has the shape the hub accepts.  Only the weekdays are checked,
+    other keys are not sent, see writableSchedule.
+    param data: Schedule dict, as read from a schedule file
+    return: List of problems, empty if the schedule is valid
+    """
+    if not isinstance(data, dict):
+        return ["Schedule must be a json object"]
+    problems = []
+    for key, day in data.items():
+        if key not in WEEKDAYS:
+            continue
+        setPoints = day.get("SetPoints") if isinstance(day, dict) else None
+        if not isinstance(setPoints, list):
+            problems.append("{} must have a SetPoints list".format(key))
+            continue
+        for setPoint in setPoints:
+            hubTime = setPoint.get("Time") if isinstance(setPoint, dict) else None
+            if not isinstance(hubTime, int) or hubTime // 100 > 23 or hubTime % 100 > 59 or hubTime < 0:
+                problems.append("{} has an invalid Time {}".format(key, hubTime))
+            elif "DegreesC" not in setPoint and "State" not in setPoint:
+                problems.append("{} set point at {} has no DegreesC or State".format(key, hubTime))
+    return problems
+
+
+def writableSchedule(data):
+    """
+    Gets the parts of schedule json a PATCH can set, the Type and the weekdays.  Other
+    keys, such as the id or the CurrentSetpoint and NextEventTime the hub reports, are
+    read only.
+    param data: Schedule dict
+    return: Dict
+    """
+    return {key: value for key, value in data.items() if key == "Type" or key in WEEKDAYS}
+
+
+class wiserSchedule:
+    """
+    One hub schedule compiled into transitions sorted by minute of the week
+    """
+
+    __slots__ = ("id", "type", "data", "_minutes", "_values")
+
+    def __init__(self, data, fromWiserTemp):
+        """
+        param data: The schedule dict from the hub
+        param fromWiserTemp: Function converting hub tenths to decimal values
+        """
+        self.id = data.get("id")
+        self.type = data.get("Type")
+        self.data = data
+        transitions = []
+        for day, weekday in enumerate(WEEKDAYS):
+            setPoints = (data.get(weekday) or {}).get("SetPoints") or []
+            for setPoint in setPoints:
+                hubTime = setPoint.get("Time")
+                if hubTime is None:
+                    continue
+                minute = day * DAY_MINUTES + (hubTime // 100) * 60 + hubTime % 100
+                if "DegreesC" in setPoint:
+                    value = fromWiserTemp(setPoint.get("DegreesC"))
+                else:
+                    value = setPoint.get("State")
+                transitions.append((minute, value))
+        transitions.sort(key=lambda transition: transition[0])
+        self._minutes = [minute for minute, _ in transitions]
+        self._values = [value for _, value in transitions]
+
+    def __len__(self):
+        return len(self._minutes)
+
+    def valueAt(self, when=None):
+        """
+        Gets the scheduled value in force at a time
+        param when: Hub local datetime, defaults to now
+        return: Degrees or On/Off state, None if the schedule is empty
+        """
+        if not self._minutes:
+            return None
+        when = when or datetime.datetime.now()
+        # Before the first transition of the week the last one from Sunday applies
+        return self._values[bisect.bisect_right(self._minutes, _weekMinute(when)) - 1]
+
+    def lastTransition(self, when=None):
+        """
+        Gets the transition in force at a time
+        param when: Hub local datetime, defaults to now
+        return: Tuple of (datetime, value) or None if the schedule is empty
+        """
+        if not self._minutes:
+            return None
+        when = when or datetime.datetime.now()
+        index = bisect.bisect_right(self._minutes, _weekMinute(when)) - 1
+        return _atWeekMinute(when, self._minutes[index], False), self._values[index]
+
+    def nextTransition(self, when=None):
+        """
+        Gets the first transition after a time
+        param when: Hub local datetime, defaults to now
+        return: Tuple of (datetime, value) or None if the schedule is empty
+        """
+        if not self._minutes:
+            return None
+        when = when or datetime.datetime.now()
+        index = bisect.bisect_right(self._minutes, _weekMinute(when)) % len(self._minutes)
+        return _atWeekMinute(when, self._minutes[index], True), self._values[index]
+
+    def transitionsWithin(self, minutes, when=None):
+        """
+        Gets the transitions after a time and up to a number of minutes later
+        param minutes: Window length, at most a week
+        param when: Hub local datetime, defaults to now
+        return: List of (datetime, value) in time order
+        """
+        when = when or datetime.datetime.now()
+        return [
+            (_atWeekMinute(when, self._minutes[index], True), self._values[index])
+            for index in _windowIndexes(self._minutes, _weekMinute(when), minutes)
+        ]
+
+
+def _windowIndexes(sortedMinutes, start, minutes):
+    """
+    Gets the indexes of week minutes after start and up to start + minutes, in time
+    order, wrapping past the end of the week
+    """
+    minutes = min(minutes, WEEK_MINUTES - 1)
+    end = start + minutes
+    first = bisect.bisect_right(sortedMinutes, start)
+    if end < WEEK_MINUTES:
+        return range(first, bisect.bisect_right(sortedMinutes, end))
+    return list(range(first, len(sortedMinutes))) + list(
+        range(0, bisect.bisect_right(sortedMinutes, end - WEEK_MINUTES))
+    )
+
+
+class wiserScheduleIndex:
+    """
+    Compiled schedules of a hub, with every transition of every schedule merged into
+    one sorted list for window queries across all schedules
+    """
+
+    __slots__ = ("schedules", "_minutes", "_transitions")
+
+    def __init__(self, schedules=None):
+        """
+        param schedules: Dict of schedule id to wiserSchedule
+        """
+        self.schedules = schedules or {}
+        merged = []
+        for schedule in self.schedules.values():
+            merged.extend(
+                (minute, schedule.id, value)
+                for minute, value in zip(schedule._minutes, schedule._values)
+            )
+        merged.sort(key=lambda transition: transition[0])
+        self._minutes = [transition[0] for transition in merged]
+        self._transitions = [transition[1:] for transition in merged]
+
+    @classmethod
+    def build(cls, scheduleData, fromWiserTemp, previous=None):
+        """
+        Compiles the hub's schedules, reusing those unchanged from a previous index
+        param scheduleData: List of schedule dicts from the hub
+        param fromWiserTemp: Function converting hub tenths to decimal values
+        param previous: wiserScheduleIndex built from the last schedule data
+        return: wiserScheduleIndex
+        """
+        previousSchedules = previous.schedules if previous is not None else {}
+        schedules = {}
+        rebuilt = 0
+        for data in scheduleData or []:
+            scheduleId = data.get("id")
+            compiled = previousSchedules.get(scheduleId)
+            if compiled is None or compiled.data != data:
+                compiled = wiserSchedule(data, fromWiserTemp)
+                rebuilt += 1
+            schedules[scheduleId] = compiled
+        if previous is not None and not rebuilt and schedules.keys() == previousSchedules.keys():
+            return previous
+        _LOGGER.debug("Compiled {} of {} schedules".format(rebuilt, len(schedules)))
+        return cls(schedules)
+
+    def get(self, scheduleId):
+        return self.schedules.get(scheduleId)
+
+    def transitionsWithin(self, minutes, when=None):
+        """
+        Gets the transitions of all schedules after a time and up to a number of minutes later
+        param minutes: Window length, at most a week
+        param when: Hub local datetime, defaults to now
+        return: List of (datetime, schedule id, value) in time order
+        """
+        when = when or datetime.datetime.now()
+        transitions = []
+        for index in _windowIndexes(self._minutes, _weekMinute(when), minutes):
+            scheduleId, value = self._transitions[index]
+            transitions.append((_atWeekMinute(when, self._minutes[index], True), scheduleId, value))
+        return transitions
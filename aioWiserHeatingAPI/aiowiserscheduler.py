@@ -0,0 +1,185 @@
+"""
+# Wiser Poll Scheduler
+
+Works out when to next poll a Wiser Hub.  Polls speed up after writes or when the
+hub data is changing, slow down while nothing changes and back off exponentially
+when the hub cannot be reached.  All delays are jittered so many hubs started at
+the same time do not poll in step.
+"""
+import asyncio
+import logging
+import random
+
+from .aiowiserhub import WiserException, TRANSIENT_ERRORS
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_INTERVAL = 30
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 120
+MAX_BACKOFF = 300
+POLL_JITTER = 0.1
+SLOWDOWN_FACTOR = 1.5
+# Failures that mean the hub is down or overloaded, so polls back off.  Others, such as
+# AuthenticationError or InvalidData, would not be fixed by polling less often.
+BACKOFF_ERRORS = TRANSIENT_ERRORS + ["HubUnavailable"]
+
+
+class wiserPollScheduler:
+    """
+    Adaptive poll timing for a single hub
+    """
+
+    def __init__(
+        self,
+        interval=POLL_INTERVAL,
+        min_interval=MIN_POLL_INTERVAL,
+        max_interval=MAX_POLL_INTERVAL,
+        max_backoff=MAX_BACKOFF,
+        jitter=POLL_JITTER,
+    ):
+        """
+        param interval: Starting seconds between polls
+        param min_interval: Fastest poll interval, used after writes and changes
+        param max_interval: Slowest poll interval when nothing is changing
+        param max_backoff: Longest wait between polls while the hub is failing
+        param jitter: Fraction of each delay that is randomised
+        """
+        self._minInterval = min(min_interval, interval)
+        self._maxInterval = max(max_interval, interval)
+        self._maxBackoff = max(max_backoff, self._maxInterval)
+        self._jitter = jitter
+        self._interval = interval
+        self._failures = 0
+        self._started = False
+        self._wakeEvent = None
+
+    @property
+    def interval(self):
+        """Current poll interval in seconds, before backoff and jitter"""
+        return self._interval
+
+    @property
+    def failures(self):
+        """Number of consecutive failed polls"""
+        return self._failures
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def recordSuccess(self, changed=False):
+        """
+        Records a successful poll
+        param changed: True if the poll found changes in the hub data
+        """
+        self._failures = 0
+        if changed:
+            self._interval = self._minInterval
+        else:
+            self._interval = min(self._interval * SLOWDOWN_FACTOR, self._maxInterval)
+
+    def recordFailure(self):
+        """Records a failed poll, increasing the backoff"""
+        self._failures += 1
+
+    def recordError(self, ex):
+        """
+        Records a poll that raised an error.  Only errors in BACKOFF_ERRORS increase the
+        backoff, others leave the poll timing as it is.
+        param ex: The WiserException the poll raised
+        """
+        if ex.status in BACKOFF_ERRORS:
+            self.recordFailure()
+
+    def recordWrite(self, path=None):
+        """
+        Records a write to the hub so the next poll happens soon to pick up the result.
+        Can be registered directly as a wiserHub write listener.
+        """
+        self._interval = self._minInterval
+        if self._wakeEvent is not None:
+            self._wakeEvent.set()
+
+    def initialDelay(self):
+        """
+        Delay before the first poll, spread randomly across the interval so hubs
+        started together do not poll together
+        return: Seconds
+        """
+        return random.uniform(0, self._interval)
+
+    def nextDelay(self):
+        """
+        Delay before the next poll
+        return: Seconds
+        """
+        if self._failures:
+            backoff = min(self._interval * 2 ** self._failures, self._maxBackoff)
+            return random.uniform(backoff / 2, backoff)
+        return self._jittered(self._interval)
+
+    async def asyncWait(self):
+        """
+        Waits until the next poll is due.  A write recorded while waiting cuts the
+        wait short to the minimum interval.
+        """
+        if self._wakeEvent is None:
+            self._wakeEvent = asyncio.Event()
+        if self._started:
+            delay = self.nextDelay()
+        else:
+            delay = self.initialDelay()
+            self._started = True
+
+        self._wakeEvent.clear()
+        try:
+            await asyncio.wait_for(self._wakeEvent.wait(), delay)
+        except asyncio.TimeoutError:
+            return
+        await asyncio.sleep(self._jittered(self._minInterval))
+
+    def attach(self, hub):
+        """
+        Listens for writes to a hub so polls speed up after them
+        param hub: wiserHub
+        return: Function that detaches the scheduler from the hub
+        """
+        return hub.addWriteListener(self.recordWrite)
+
+    async def asyncPoll(self, hub):
+        """
+        Refreshes a hub once and records the result
+        param hub: wiserHub
+        return: Boolean
+        """
+        try:
+            result = await hub.asyncGetHubData()
+        except WiserException as ex:
+            _LOGGER.debug(
+                "Error polling Wiser Hub {}, error {} {}".format(hub.host, ex.status, ex.message)
+            )
+            self.recordError(ex)
+            raise
+        self.recordSuccess(bool(hub.lastChanges))
+        return result
+
+    async def run(self, hub, poll=None):
+        """
+        Polls a hub until cancelled
+        param hub: wiserHub
+        param poll: Optional coroutine function called for each poll, which should call
+            asyncPoll and handle its errors.  Defaults to asyncPoll with errors logged.
+        """
+        async def pollHub():
+            try:
+                await self.asyncPoll(hub)
+            except WiserException:
+                pass
+
+        detach = self.attach(hub)
+        try:
+            while True:
+                await self.asyncWait()
+                await (poll or pollHub)()
+        finally:
+            detach()
@@ -0,0 +1,501 @@
+"""
+# Wiser Hub Simulator
+
+A local stand in for a Wiser Hub built on the aiohttp web server.  It serves the
+domain/, domain/<Section>/, network/ and v2/schedules/ endpoints and applies PATCH
+requests to its own state, with configurable latency, error injection and synthetic
+homes of any size.  Used to test and benchmark wiserHub without a real hub, the tests
+run against it with
+
+    python -m pytest tests
+
+Like the hub, a PATCH only changes what it sends.  A schedule PATCH replaces the days
+in it and keeps the days it leaves out.
+"""
+import asyncio
+import copy
+import logging
+import random
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+SIMULATOR_API_KEY = "simulator"
+SIMULATOR_HOST = "127.0.0.1"
+ROOMSTAT_EVERY = 3
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _buildSchedule(scheduleId):
+    """Builds a heating schedule with a morning and evening period each day"""
+    weekday = {
+        "SetPoints": [
+            {"Time": 630, "DegreesC": 200},
+            {"Time": 830, "DegreesC": 160},
+            {"Time": 1630, "DegreesC": 210},
+            {"Time": 2230, "DegreesC": 160},
+        ]
+    }
+    weekend = {
+        "SetPoints": [
+            {"Time": 800, "DegreesC": 210},
+            {"Time": 2300, "DegreesC": 160},
+        ]
+    }
+    schedule = {"id": scheduleId, "Type": "Heating"}
+    for day in WEEKDAYS:
+        schedule[day] = copy.deepcopy(weekend if day in ["Saturday", "Sunday"] else weekday)
+    return schedule
+
+
+def buildDomain(rooms=10, smartplugs=2, hotwater=True, seed=None):
+    """
+    Builds a synthetic domain payload shaped like a real hub's
+    param rooms: Number of rooms
+    param smartplugs: Number of smart plugs
+    param hotwater: Include a hot water channel
+    param seed: Random seed for repeatable homes
+    return: Dict
+    """
+    rand = random.Random(seed)
+    nextId = iter(range(1, 1000000))
+    devices = [
+        {
+            "id": 0,
+            "NodeId": 0,
+            "ProductType": "Controller",
+            "ProductIdentifier": "Controller",
+            "ActiveFirmwareVersion": "3.8.8",
+            "ModelIdentifier": "WT724R1S0902",
+            "DeviceLockEnabled": False,
+            "DisplayedSignalStrength": "VeryGood",
+        }
+    ]
+    domainRooms = []
+    smartValves = []
+    roomStats = []
+    schedules = []
+
+    def addDevice(deviceId, productType):
+        device = {
+            "id": deviceId,
+            "NodeId": deviceId,
+            "ProductType": productType,
+            "ProductIdentifier": productType,
+            "ActiveFirmwareVersion": "04E1000900610004",
+            "ModelIdentifier": productType,
+            "DeviceLockEnabled": False,
+            "DisplayedSignalStrength": rand.choice(["VeryGood", "Good", "Medium"]),
+            "ReceptionOfController": {"Rssi": rand.randint(-90, -40), "Lqi": rand.randint(80, 255)},
+            "ReceptionOfDevice": {"Rssi": rand.randint(-90, -40), "Lqi": rand.randint(80, 255)},
+            "ParentNodeId": 0,
+            "SerialNumber": "SIM{:08d}".format(deviceId),
+        }
+        if productType in ["iTRV", "RoomStat"]:
+            device["BatteryVoltage"] = rand.randint(26, 31)
+            device["BatteryLevel"] = "Normal"
+        devices.append(device)
+
+    for roomNumber in range(1, rooms + 1):
+        roomId = next(nextId)
+        temperature = rand.randint(160, 230)
+        schedules.append(_buildSchedule(roomId))
+        room = {
+            "id": roomId,
+            "Name": "Room {}".format(roomNumber),
+            "ScheduleId": roomId,
+            "HeatingRate": 1200,
+            "Mode": "Auto",
+            "DemandType": "Modulating",
+            "WindowDetectionActive": False,
+            "CalculatedTemperature": temperature,
+            "CurrentSetPoint": 200,
+            "PercentageDemand": 0,
+            "ControlOutputState": "Off",
+            "SetpointOrigin": "FromSchedule",
+            "DisplayedSetPoint": 200,
+            "ScheduledSetPoint": 200,
+            "WindowState": "Closed",
+        }
+        valveIds = []
+        for _ in range(rand.randint(1, 2)):
+            valveId = next(nextId)
+            valveIds.append(valveId)
+            addDevice(valveId, "iTRV")
+            smartValves.append(
+                {
+                    "id": valveId,
+                    "SetpointOrigin": "FromSchedule",
+                    "SetPoint": 200,
+                    "MeasuredTemperature": temperature,
+                    "PercentageDemand": 0,
+                    "WindowState": "Closed",
+                }
+            )
+        room["SmartValveIds"] = valveIds
+        if roomNumber % ROOMSTAT_EVERY == 0:
+            roomStatId = next(nextId)
+            room["RoomStatId"] = roomStatId
+            addDevice(roomStatId, "RoomStat")
+            roomStats.append(
+                {
+                    "id": roomStatId,
+                    "SetPoint": 200,
+                    "MeasuredTemperature": temperature,
+                    "MeasuredHumidity": rand.randint(40, 65),
+                }
+            )
+        domainRooms.append(room)
+
+    plugs = []
+    for plugNumber in range(1, smartplugs + 1):
+        plugId = next(nextId)
+        addDevice(plugId, "SmartPlug")
+        plugs.append(
+            {
+                "id": plugId,
+                "Name": "Plug {}".format(plugNumber),
+                "Mode": "Manual",
+                "ManualState": "Off",
+                "OutputState": "Off",
+                "ControlSource": "FromManualMode",
+                "ScheduledState": "Off",
+            }
+        )
+
+    domain = {
+        "System": {
+            "PairingStatus": "Paired",
+            "OverrideType": "None",
+            "TimeZoneOffset": 0,
+            "AutomaticDaylightSaving": True,
+            "SystemMode": "Heat",
+            "FotaEnabled": True,
+            "ValveProtectionEnabled": False,
+            "EcoModeEnabled": False,
+            "BrandName": "WiserHeat",
+            "ActiveSystemVersion": "2.50.3-0b2a2a1",
+            "HeatingButtonOverrideState": "Off",
+            "HotWaterButtonOverrideState": "Off",
+        },
+        "Cloud": {
+            "Environment": "Prod",
+            "DetailedPublishing": False,
+            "WiserApiHost": "api-nl.wiserair.com",
+            "BootStrapApiHost": "bootstrap.gl.struxurewarecloud.com",
+        },
+        "HeatingChannel": [
+            {
+                "id": 1,
+                "Name": "Channel-1",
+                "RoomIds": [room["id"] for room in domainRooms],
+                "PercentageDemand": 0,
+                "DemandOnOffOutput": "Off",
+                "HeatingRelayState": "Off",
+                "IsSmartValvePreventingDemand": False,
+            }
+        ],
+        "Room": domainRooms,
+        "Device": devices,
+        "SmartValve": smartValves,
+        "RoomStat": roomStats,
+        "Schedule": schedules,
+        "SmartPlug": plugs,
+        "DeviceCapabilityMatrix": {
+            "Roomstat": True,
+            "ITRV": True,
+            "SmartPlug": True,
+            "UFH": False,
+            "UFHFloorTempSensor": False,
+            "UFHDewSensor": False,
+            "HACT": False,
+            "LACT": False,
+        },
+    }
+    if hotwater:
+        hotwaterScheduleId = next(nextId)
+        schedules.append(_buildSchedule(hotwaterScheduleId))
+        domain["HotWater"] = [
+            {
+                "id": 2,
+                "OverrideType": "None",
+                "ScheduleId": hotwaterScheduleId,
+                "Mode": "Auto",
+                "WaterHeatingState": "Off",
+                "HotWaterRelayState": "Off",
+            }
+        ]
+    return domain
+
+
+def buildNetwork(hostName="WiserHeatSIM001"):
+    """Builds a network payload"""
+    return {
+        "Station": {
+            "Enabled": True,
+            "SSID": "SimulatedWifi",
+            "Scanning": False,
+            "NetworkInterface": {
+                "HostName": hostName,
+                "DhcpMode": "Client",
+                "IPv4Address": SIMULATOR_HOST,
+                "IPv4SubnetMask": "255.255.255.0",
+                "IPv4DefaultGateway": SIMULATOR_HOST,
+            },
+            "ConnectionStatus": "Connected",
+            "RSSI": {"Current": -60, "Min": -70, "Max": -50},
+        }
+    }
+
+
+class wiserHubSimulator:
+    """
+    A simulated Wiser Hub served over http on the local machine
+    """
+
+    def __init__(
+        self,
+        rooms=10,
+        smartplugs=2,
+        api_key=SIMULATOR_API_KEY,
+        latency=0,
+        latency_jitter=0,
+        error_rate=0,
+        error_status=500,
+        drop_rate=0,
+        stall_rate=0,
+        stall_time=30,
+        change_rate=0,
+        seed=None,
+        port=0,
+        v2_api=True,
+    ):
+        """
+        param rooms: Number of rooms in the synthetic home
+        param smartplugs: Number of smart plugs
+        param api_key: Secret the simulator expects, other secrets get a 401
+        param latency: Seconds added to every response
+        param latency_jitter: Max random seconds added on top of latency
+        param error_rate: Fraction of requests answered with an error status
+        param error_status: Http status of the injected errors, such as 400 for requests the
+            hub rejects
+        param drop_rate: Fraction of requests where the connection is dropped
+        param stall_rate: Fraction of requests that stall for stall_time seconds
+        param stall_time: Seconds a stalled request waits before responding
+        param change_rate: Fraction of rooms whose temperature drifts on each domain read
+        param seed: Random seed for repeatable homes and errors
+        param port: Port to listen on, 0 picks a free port
+        param v2_api: Serve the v2 schedules api, False to act as a hub without it
+        """
+        self._rand = random.Random(seed)
+        self._domain = buildDomain(rooms, smartplugs, seed=seed)
+        self._network = buildNetwork()
+        self._apiKey = api_key
+        self.latency = latency
+        self.latencyJitter = latency_jitter
+        self.errorRate = error_rate
+        self.errorStatus = error_status
+        self.dropRate = drop_rate
+        self.stallRate = stall_rate
+        self.stallTime = stall_time
+        self.changeRate = change_rate
+        self._port = port
+        self._v2Api = v2_api
+        self._runner = None
+        self.requestCount = 0
+        self.patches = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    @property
+    def host(self):
+        """Host and port to pass to wiserHub"""
+        return "{}:{}".format(SIMULATOR_HOST, self._port)
+
+    @property
+    def apiKey(self):
+        return self._apiKey
+
+    @property
+    def domain(self):
+        """The simulator's domain state, which can be edited directly"""
+        return self._domain
+
+    @property
+    def network(self):
+        return self._network
+
+    def _application(self):
+        app = web.Application()
+        app.router.add_get("/data/domain/", self._getDomain)
+        app.router.add_get("/data/network/", self._getNetwork)
+        app.router.add_get("/data/domain/{section}/", self._getSection)
+        if self._v2Api:
+            app.router.add_get("/data/v2/schedules/", self._getV2Schedules)
+        app.router.add_patch("/data/domain/{section}/{entityId:.*}", self._patch)
+        return app
+
+    async def start(self):
+        """Starts serving on the local machine"""
+        self._runner = web.AppRunner(self._application(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, SIMULATOR_HOST, self._port)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+        _LOGGER.debug("Wiser Hub simulator listening on {}".format(self.host))
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def drift(self, fraction=None):
+        """
+        Moves the temperature of a random set of rooms up or down a little
+        param fraction: Fraction of rooms to change, defaults to change_rate
+        """
+        fraction = self.changeRate if fraction is None else fraction
+        rooms = self._domain["Room"]
+        for room in self._rand.sample(rooms, int(round(len(rooms) * fraction))):
+            room["CalculatedTemperature"] += self._rand.choice([-1, 1])
+
+    async def _simulateConditions(self, request):
+        """
+        Applies the configured latency and error injection to a request
+        return: An error response to send, or None to carry on
+        """
+        self.requestCount += 1
+        if self.latency or self.latencyJitter:
+            await asyncio.sleep(self.latency + self._rand.uniform(0, self.latencyJitter))
+        if request.headers.get("SECRET") != self._apiKey:
+            return web.Response(status=401)
+        if self.stallRate and self._rand.random() < self.stallRate:
+            await asyncio.sleep(self.stallTime)
+        if self.dropRate and self._rand.random() < self.dropRate:
+            request.transport.close()
+            return web.Response(status=500)
+        if self.errorRate and self._rand.random() < self.errorRate:
+            return web.Response(status=self.errorStatus)
+        return None
+
+    async def _getDomain(self, request):
+        error = await self._simulateConditions(request)
+        if error is not None:
+            return error
+        if self.changeRate:
+            self.drift()
+        return web.json_response(self._domain)
+
+    async def _getNetwork(self, request):
+        error = await self._simulateConditions(request)
+        if error is not None:
+            return error
+        return web.json_response(self._network)
+
+    def _findSection(self, section):
+        for key in self._domain:
+            if key.lower() == section.lower():
+                return key
+        return None
+
+    async def _getSection(self, request):
+        error = await self._simulateConditions(request)
+        if error is not None:
+            return error
+        section = self._findSection(request.match_info["section"])
+        if section is None:
+            return web.Response(status=404)
+        if section == "Room" and self.changeRate:
+            self.drift()
+        return web.json_response(self._domain[section])
+
+    async def _getV2Schedules(self, request):
+        """Serves the schedules grouped by type with each day as lists, like the v2 api"""
+        error = await self._simulateConditions(request)
+        if error is not None:
+            return error
+        groups = {}
+        for schedule in self._domain.get("Schedule", []):
+            converted = {}
+            for key, value in schedule.items():
+                if key in WEEKDAYS:
+                    setPoints = value.get("SetPoints", [])
+                    valueKey = "DegreesC" if setPoints and "DegreesC" in setPoints[0] else "State"
+                    value = {
+                        "Time": [setPoint.get("Time") for setPoint in setPoints],
+                        valueKey: [setPoint.get(valueKey) for setPoint in setPoints],
+                    }
+                converted[key] = value
+            groups.setdefault(schedule.get("Type", "Heating"), []).append(converted)
+        return web.json_response(groups)
+
+    def _findEntity(self, section, entityId):
+        try:
+            entityId = int(entityId)
+        except ValueError:
+            return None
+        for entity in self._domain.get(section, []):
+            if entity.get("id") == entityId:
+                return entity
+        return None
+
+    async def _patch(self, request):
+        error = await self._simulateConditions(request)
+        if error is not None:
+            return error
+        section = self._findSection(request.match_info["section"])
+        entityId = request.match_info["entityId"].strip("/")
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        self.patches.append((request.path, payload))
+
+        if section == "System":
+            if entityId == "RequestOverride":
+                self._domain["System"]["OverrideType"] = "Away" if payload.get("type") == 2 else "None"
+            else:
+                self._domain["System"].update(payload)
+            return web.json_response(self._domain["System"])
+
+        entity = self._findEntity(section, entityId) if section else None
+        if entity is None:
+            return web.Response(status=404)
+        if section == "Schedule":
+            entity.update(payload, id=int(entityId))
+        elif section == "Room":
+            self._applyRoomPatch(entity, payload)
+        elif section == "SmartPlug":
+            if "RequestOutput" in payload:
+                entity["ManualState"] = payload["RequestOutput"]
+                entity["OutputState"] = payload["RequestOutput"]
+            if "Mode" in payload:
+                entity["Mode"] = payload["Mode"]
+        elif section == "HotWater":
+            override = payload.get("RequestOverride", {})
+            if override.get("Type") == "Manual":
+                entity["OverrideType"] = "Manual"
+                entity["WaterHeatingState"] = "On" if override.get("SetPoint", 0) > 0 else "Off"
+            else:
+                entity["OverrideType"] = "None"
+        return web.json_response(entity)
+
+    def _applyRoomPatch(self, room, payload):
+        if "Mode" in payload:
+            room["Mode"] = payload["Mode"]
+        override = payload.get("RequestOverride")
+        if override is not None:
+            if override.get("Type") == "Manual":
+                room["CurrentSetPoint"] = override.get("SetPoint")
+                room["DisplayedSetPoint"] = override.get("SetPoint")
+                room["SetpointOrigin"] = "FromManualOverride"
+            else:
+                room["CurrentSetPoint"] = room["ScheduledSetPoint"]
+                room["DisplayedSetPoint"] = room["ScheduledSetPoint"]
+                room["SetpointOrigin"] = "FromSchedule"
@@ -0,0 +1,194 @@
+"""
+# Wiser Hub Stats
+
+Request counters, latency histograms and payload sizes per hub api endpoint, plus a
+breakdown of where the time in each refresh goes.  Every wiserHub records into one
+of these, available as hub.stats.
+"""
+import bisect
+import logging
+import math
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, math.inf]
+REFRESH_PHASES = ["connect", "transfer", "decode", "build"]
+
+
+class wiserLatencyHistogram:
+    """
+    Bucketed latency histogram with count, total, min and max
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        milliseconds = seconds * 1000
+        self._counts[bisect.bisect_left(self._buckets, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.min = milliseconds if self.min is None else min(self.min, milliseconds)
+        self.max = milliseconds if self.max is None else max(self.max, milliseconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """
+        Gets the upper bound of the bucket holding a percentile
+        param percent: 0 to 100
+        return: Milliseconds or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        target = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self._buckets, self._counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def asDict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip(self._buckets, self._counts)),
+        }
+
+
+class wiserEndpointStats:
+    """
+    Stats for one api endpoint
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.unchanged = 0
+        self.bytes = 0
+        self.errors = {}
+        self.latency = wiserLatencyHistogram()
+
+    def asDict(self):
+        return {
+            "requests": self.requests,
+            "unchanged": self.unchanged,
+            "bytes": self.bytes,
+            "errors": dict(self.errors),
+            "latency": self.latency.asDict(),
+        }
+
+
+class wiserHubStats:
+    """
+    Request and refresh stats for a hub
+    """
+
+    def __init__(self, hook=None):
+        """
+        param hook: Optional function called with a dict for every request and refresh
+        """
+        self._hook = hook
+        self.reset()
+
+    def reset(self):
+        self.endpoints = {}
+        self.refreshes = 0
+        self.refreshErrors = 0
+        self.unchangedRefreshes = 0
+        self.refreshLatency = wiserLatencyHistogram()
+        self.phaseLatency = {phase: wiserLatencyHistogram() for phase in REFRESH_PHASES}
+        self.lastRefresh = None
+
+    def _callHook(self, event):
+        if self._hook is None:
+            return
+        try:
+            self._hook(event)
+        except Exception as ex:
+            _LOGGER.error("Error in Wiser Hub stats hook {}".format(ex))
+
+    def recordRequest(
+        self, endpoint, seconds, size=0, error=None, connect=0, transfer=0, decode=0, unchanged=False
+    ):
+        """
+        Records one http request
+        param endpoint: Method and api path, such as GET domain/
+        param seconds: Total time taken
+        param size: Response body bytes
+        param error: WiserHubException status, or the exception class name for any other
+            failure including cancellation, if the request failed
+        param connect: Seconds until the response headers arrived
+        param transfer: Seconds reading the response body
+        param decode: Seconds decoding the json
+        param unchanged: True if the response was the same as the last one so was not decoded
+        """
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = wiserEndpointStats()
+        stats.requests += 1
+        if unchanged:
+            stats.unchanged += 1
+        stats.bytes += size
+        stats.latency.record(seconds)
+        if error is not None:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+        self._callHook(
+            {
+                "type": "request",
+                "endpoint": endpoint,
+                "seconds": seconds,
+                "bytes": size,
+                "error": error,
+                "connect": connect,
+                "transfer": transfer,
+                "decode": decode,
+                "unchanged": unchanged,
+            }
+        )
+
+    def recordRefresh(self, seconds, phases, size=0, error=None, unchanged=False):
+        """
+        Records one refresh
+        param seconds: Total time taken
+        param phases: Dict of connect, transfer, decode and build seconds.  Request phases
+            are summed across the requests in the refresh, which may overlap.
+        param size: Response bytes across the refresh
+        param error: WiserHubException status, or the exception class name for any other
+            failure including cancellation, if the refresh failed
+        param unchanged: True if the hub data was the same as the last refresh
+        """
+        self.refreshes += 1
+        if unchanged:
+            self.unchangedRefreshes += 1
+        if error is not None:
+            self.refreshErrors += 1
+        else:
+            self.refreshLatency.record(seconds)
+            for phase in REFRESH_PHASES:
+                self.phaseLatency[phase].record(phases.get(phase, 0))
+        self.lastRefresh = dict(phases, seconds=seconds, bytes=size, error=error, unchanged=unchanged)
+        self._callHook(dict(self.lastRefresh, type="refresh"))
+
+    def asDict(self):
+        return {
+            "endpoints": {endpoint: stats.asDict() for endpoint, stats in self.endpoints.items()},
+            "refreshes": self.refreshes,
+            "refreshErrors": self.refreshErrors,
+            "unchangedRefreshes": self.unchangedRefreshes,
+            "refreshLatency": self.refreshLatency.asDict(),
+            "phaseLatency": {phase: stats.asDict() for phase, stats in self.phaseLatency.items()},
+            "lastRefresh": self.lastRefresh,
+        }
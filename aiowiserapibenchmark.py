@@ -0,0 +1,143 @@
+"""
+Benchmarks wiserHub refreshes against the local Wiser Hub simulator.
+
+Reports refresh latency, throughput and CPU time per poll for a range of home sizes.
+With --decode reports the time to decode domain payloads of each size with each
+installed json decoder instead.
+
+    python aiowiserapibenchmark.py --rooms 1 10 100 500 --hubs 10 --polls 20
+    python aiowiserapibenchmark.py --decode --rooms 10 100 500
+    python aiowiserapibenchmark.py --rooms 50 --latency 0.05 --policy tiered --api-version 2
+"""
+from aioWiserHeatingAPI.aiowiserhub import (
+    wiserHub,
+    orjson,
+    ujson,
+    DEFAULT_REFRESH_POLICY,
+    TIERED_REFRESH_POLICY,
+)
+from aioWiserHeatingAPI.aiowisersimulator import wiserHubSimulator, buildDomain
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+
+REFRESH_POLICIES = {"default": DEFAULT_REFRESH_POLICY, "tiered": TIERED_REFRESH_POLICY}
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def poll_hub(hub, polls, latencies, errors):
+    for _ in range(polls):
+        start = time.perf_counter()
+        try:
+            await hub.asyncGetHubData()
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors.append(time.perf_counter() - start)
+
+
+async def benchmark(rooms, args):
+    async with wiserHubSimulator(
+        rooms=rooms,
+        smartplugs=args.smartplugs,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        change_rate=args.change_rate,
+        seed=1,
+    ) as simulator:
+        hubs = [
+            wiserHub(
+                simulator.host,
+                simulator.apiKey,
+                api_version=args.api_version,
+                refresh_policy=REFRESH_POLICIES[args.policy],
+            )
+            for _ in range(args.hubs)
+        ]
+        # Warm up connections and initial state
+        await asyncio.gather(*[hub.asyncGetHubData() for hub in hubs])
+
+        latencies = []
+        errors = []
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[poll_hub(hub, args.polls, latencies, errors) for hub in hubs])
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+
+        for hub in hubs:
+            await hub.close()
+
+    polls = len(latencies) + len(errors)
+    # The simulator runs in this process so CPU includes serving the requests
+    print(
+        "{:>6} {:>6} {:>8} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.1f} {:>12.2f}".format(
+            rooms,
+            args.hubs,
+            len(errors),
+            statistics.mean(latencies) * 1000 if latencies else 0,
+            percentile(latencies, 50) * 1000 if latencies else 0,
+            percentile(latencies, 95) * 1000 if latencies else 0,
+            polls / wall_time,
+            cpu_time / polls * 1000,
+        )
+    )
+
+
+def benchmark_decode(args):
+    decoders = {"json": json.loads}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+    if ujson is not None:
+        decoders["ujson"] = ujson.loads
+
+    print("{:>6} {:>10}".format("rooms", "KB") + "".join(
+        "{:>14}".format(name + " ms") for name in decoders
+    ))
+    for rooms in args.rooms:
+        payload = json.dumps(buildDomain(rooms, args.smartplugs, seed=1)).encode()
+        timings = []
+        for decoder in decoders.values():
+            start = time.perf_counter()
+            for _ in range(args.polls):
+                decoder(payload)
+            timings.append((time.perf_counter() - start) / args.polls * 1000)
+        print("{:>6} {:>10.1f}".format(rooms, len(payload) / 1024) + "".join(
+            "{:>14.3f}".format(timing) for timing in timings
+        ))
+
+
+async def main(args):
+    print(
+        "{:>6} {:>6} {:>8} {:>10} {:>10} {:>10} {:>10} {:>12}".format(
+            "rooms", "hubs", "errors", "mean ms", "p50 ms", "p95 ms", "polls/s", "cpu ms/poll"
+        )
+    )
+    for rooms in args.rooms:
+        await benchmark(rooms, args)
+
+
+parser = argparse.ArgumentParser(description="Benchmark wiserHub against the hub simulator")
+parser.add_argument("--rooms", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+parser.add_argument("--smartplugs", type=int, default=2)
+parser.add_argument("--hubs", type=int, default=1, help="hubs polling the simulator at once")
+parser.add_argument("--polls", type=int, default=20, help="polls per hub")
+parser.add_argument("--latency", type=float, default=0, help="simulated hub latency in seconds")
+parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests that fail")
+parser.add_argument("--change-rate", type=float, default=0.1, help="fraction of rooms changing per poll")
+parser.add_argument("--policy", choices=sorted(REFRESH_POLICIES), default="default", help="hub refresh policy")
+parser.add_argument("--api-version", type=int, default=1, help="hub api version, 2 for v2 schedules")
+parser.add_argument("--decode", action="store_true", help="benchmark json decoding only")
+
+args = parser.parse_args()
+if args.decode:
+    benchmark_decode(args)
+else:
+    asyncio.run(main(args))
@@ -30,8 +30,10 @@ class wiserTest:
             print(STARS)
 
     async def async_tests(self):
-        wh = wiserHub(self.wiserip, self.wiserkey)
+        async with wiserHub(self.wiserip, self.wiserkey) as wh:
+            return await self.async_hub_tests(wh)
 
+    async def async_hub_tests(self, wh):
         print("###################################################")
         print("Connecting To Hub")
         print("###################################################")
@@ -18,6 +18,11 @@ setuptools.setup(
 	"aiofiles>=0.4.0", 
 	"aiohttp>=3.6.2"
     ],
+    extras_require={
+        "orjson": ["orjson>=3.0"],
+        "numpy": ["numpy>=1.16"],
+        "test": ["pytest"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
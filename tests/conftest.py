@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from aioWiserHeatingAPI.aiowiserhub import wiserHub
+from aioWiserHeatingAPI.aiowisersimulator import wiserHubSimulator
+
+
+@pytest.fixture
+def run_hub():
+    """
+    Gets a function that runs a test coroutine with a started simulator and a hub
+    connected to it.  The coroutine is called with (simulator, hub).  simulator_options
+    are passed to wiserHubSimulator and other keyword arguments to wiserHub.
+    """
+
+    def run(test, rooms=3, simulator_options=None, **hub_options):
+        async def main():
+            async with wiserHubSimulator(rooms=rooms, seed=1, **(simulator_options or {})) as simulator:
+                async with wiserHub(simulator.host, simulator.apiKey, **hub_options) as hub:
+                    await test(simulator, hub)
+
+        asyncio.run(main())
+
+    return run
+
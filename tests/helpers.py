@@ -0,0 +1,11 @@
+"""Shared checks for the simulator tests"""
+
+
+def requests(hub):
+    """Gets the number of requests the hub made to each endpoint"""
+    return {endpoint: stats.requests for endpoint, stats in hub.stats.endpoints.items()}
+
+
+def room_patches(simulator, roomId):
+    """Gets the payloads of the PATCHes the simulator got for a room"""
+    return [payload for path, payload in simulator.patches if path == "/data/domain/Room/{}".format(roomId)]
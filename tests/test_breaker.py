@@ -0,0 +1,74 @@
+"""
+Tests of request retries and the circuit breaker against the Wiser Hub simulator.
+"""
+import asyncio
+import time
+
+import pytest
+
+from aioWiserHeatingAPI import aiowiserhub
+from aioWiserHeatingAPI.aiowiserhub import WiserException
+
+
+def test_server_errors_open_the_breaker_and_a_probe_closes_it(run_hub):
+    async def test(simulator, hub):
+        simulator.errorRate = 1
+        for _ in range(2):
+            with pytest.raises(WiserException):
+                await hub.asyncGetHubData()
+        assert hub.circuitState == "open"
+        requestCount = simulator.requestCount
+        with pytest.raises(WiserException) as raised:
+            await hub.asyncGetHubData()
+        assert raised.value.status == "HubUnavailable"
+        assert simulator.requestCount == requestCount
+
+        simulator.errorRate = 0
+        await asyncio.sleep(0.3)
+        assert hub.circuitState == "closed"
+        assert await hub.asyncGetHubData()
+
+    run_hub(test, retries=0, breaker_threshold=3, breaker_probe_interval=0.05)
+
+
+def test_rejected_requests_do_not_open_the_breaker(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        simulator.errorRate = 1
+        simulator.errorStatus = 400
+        for _ in range(4):
+            with pytest.raises(WiserException):
+                await hub.asyncSetRoomTemperature(1, 21)
+        assert hub.circuitState == "closed"
+        simulator.errorRate = 0
+        assert await hub.asyncGetHubData()
+
+    run_hub(test, breaker_threshold=3, write_coalesce_window=0)
+
+
+def test_server_errors_are_retried(run_hub):
+    async def test(simulator, hub):
+        simulator.errorRate = 1
+        with pytest.raises(WiserException) as raised:
+            await hub.asyncGetHubData()
+        assert raised.value.status == "ServerError"
+        # Domain and network each tried three times
+        assert simulator.requestCount == 6
+
+    run_hub(test, retries=2, retry_delay=0.01, breaker_threshold=0)
+
+
+def test_timeouts_are_not_retried(run_hub, monkeypatch):
+    monkeypatch.setattr(aiowiserhub, "TIMEOUT", 0.2)
+
+    async def test(simulator, hub):
+        simulator.stallRate = 1
+        simulator.stallTime = 1
+        start = time.perf_counter()
+        with pytest.raises(WiserException) as raised:
+            await hub.asyncGetHubData()
+        assert raised.value.status == "TimeoutError"
+        assert time.perf_counter() - start < 0.5
+        assert simulator.requestCount == 2
+
+    run_hub(test, retries=2, retry_delay=0.01)
@@ -0,0 +1,37 @@
+"""
+Tests of the bulk set functions against the Wiser Hub simulator.
+"""
+
+
+def test_bulk_set_rejects_duplicate_rooms(run_hub):
+    async def test(simulator, hub):
+        results = await hub.asyncSetRoomTemperatures([(1, 19), (1, 50), (3, 21), (99, 21)])
+        assert results[1].status == "DuplicateRoom"
+        assert results[3] is True
+        assert results[99].status == "InvalidRoom"
+        assert [path for path, _ in simulator.patches] == ["/data/domain/Room/3"]
+
+    run_hub(test)
+
+
+def test_bulk_set_checks_every_room_before_sending(run_hub):
+    async def test(simulator, hub):
+        results = await hub.asyncSetRoomModes({1: "boost", 3: "sideways", 5: "auto"})
+        assert results[1] is True
+        assert results[3].status == "InvalidMode"
+        assert results[5] is True
+        assert {path for path, _ in simulator.patches} == {"/data/domain/Room/1", "/data/domain/Room/5"}
+
+    run_hub(test)
+
+
+def test_bulk_smart_plug_states_are_sent_together(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        plugIds = [plug["id"] for plug in hub.smartPlugs]
+        assert len(plugIds) == 2
+        results = await hub.asyncSetSmartPlugStates({plugId: "On" for plugId in plugIds})
+        assert results == {plugId: True for plugId in plugIds}
+        assert all(hub.smartPlug(plugId)["OutputState"] == "On" for plugId in plugIds)
+
+    run_hub(test)
@@ -0,0 +1,69 @@
+"""
+Tests of the on disk snapshot cache against the Wiser Hub simulator.
+"""
+import os
+import socket
+
+from aioWiserHeatingAPI.aiowiserhub import DOMAIN_SECTIONS
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_cached_data_is_served_before_the_first_refresh(run_hub, tmp_path):
+    cacheFile = str(tmp_path / "hub.cache")
+
+    async def fill(simulator, hub):
+        await hub.asyncGetHubData()
+
+    async def test(simulator, hub):
+        assert hub.stale
+        assert hub.rooms == simulator.domain["Room"]
+        await hub.asyncGetHubData()
+        assert not hub.stale
+
+    # The cache is kept per hub host, so both hubs need the simulator on the same port
+    simulator = {"port": free_port()}
+    run_hub(fill, simulator_options=simulator, cache_file=cacheFile)
+    run_hub(test, simulator_options=simulator, cache_file=cacheFile)
+
+
+def test_sections_stay_stale_until_refreshed(run_hub, tmp_path):
+    cacheFile = str(tmp_path / "hub.cache")
+
+    async def fill(simulator, hub):
+        await hub.asyncGetHubData()
+
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert hub.stale
+        assert "Room" not in hub.staleSections
+        assert "network" not in hub.staleSections
+        assert "Device" in hub.staleSections
+        await hub.asyncLoadSections(*DOMAIN_SECTIONS)
+        await hub.asyncGetHubData()
+        assert not hub.stale
+
+    simulator = {"port": free_port()}
+    run_hub(fill, simulator_options=simulator, cache_file=cacheFile)
+    run_hub(test, simulator_options=simulator, cache_file=cacheFile, sections=["Room"])
+
+
+def test_unchanged_data_is_not_written_again(run_hub, tmp_path):
+    cacheFile = str(tmp_path / "hub.cache")
+
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        written = os.stat(cacheFile).st_mtime_ns
+        os.utime(cacheFile, ns=(0, 0))
+        await hub.asyncGetHubData()
+        assert hub.lastRefreshUnchanged
+        assert os.stat(cacheFile).st_mtime_ns == 0
+        await hub.asyncSetRoomTemperature(1, 23)
+        await hub.asyncGetHubData()
+        assert os.stat(cacheFile).st_mtime_ns >= written
+
+    run_hub(test, cache_file=cacheFile, cache_write_interval=0)
@@ -0,0 +1,62 @@
+"""
+Tests of the changes found between refreshes against the Wiser Hub simulator.
+"""
+import asyncio
+
+from aioWiserHeatingAPI.aiowiserhub import CHANGE_ADDED, CHANGE_CHANGED, CHANGE_REMOVED
+
+
+def test_first_refresh_adds_every_entity(run_hub):
+    async def test(simulator, hub):
+        changes = await hub.asyncGetHubChanges()
+        assert {change.changeType for change in changes} == {CHANGE_ADDED}
+        rooms = [change.entityId for change in changes if change.entityType == "Room"]
+        assert sorted(rooms) == [room["id"] for room in simulator.domain["Room"]]
+
+    run_hub(test)
+
+
+def test_only_changed_fields_are_reported(run_hub):
+    async def test(simulator, hub):
+        received = []
+        hub.addChangeListener(received.append)
+        await hub.asyncGetHubData()
+        assert await hub.asyncGetHubChanges() == []
+        room = simulator.domain["Room"][0]
+        before = room["CalculatedTemperature"]
+        room["CalculatedTemperature"] += 5
+        (change,) = await hub.asyncGetHubChanges()
+        assert change.entityType == "Room"
+        assert change.entityId == room["id"]
+        assert change.changeType == CHANGE_CHANGED
+        assert change.fields == {"CalculatedTemperature": (before, before + 5)}
+        # Listeners are called only for refreshes that changed something
+        assert len(received) == 2
+        assert received[1] == [change]
+
+    run_hub(test)
+
+
+def test_removed_entities_are_reported(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        plug = simulator.domain["SmartPlug"].pop()
+        changes = await hub.asyncGetHubChanges()
+        assert [(change.entityType, change.entityId, change.changeType) for change in changes] == [
+            ("SmartPlug", plug["id"], CHANGE_REMOVED)
+        ]
+
+    run_hub(test)
+
+
+def test_changes_iterator_yields_each_change_set(run_hub):
+    async def test(simulator, hub):
+        changes = hub.changes()
+        # The iterator listens once it is first awaited
+        first = asyncio.ensure_future(changes.__anext__())
+        await asyncio.sleep(0)
+        await hub.asyncGetHubData()
+        assert await asyncio.wait_for(first, 1) == hub.snapshot.changes
+        await changes.aclose()
+
+    run_hub(test)
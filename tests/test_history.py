@@ -0,0 +1,56 @@
+"""
+Tests of the history ring buffers against the Wiser Hub simulator.
+"""
+from pytest import approx
+
+from aioWiserHeatingAPI.aiowiserhistory import wiserHistory
+
+
+def test_every_refresh_is_recorded(run_hub):
+    async def test(simulator, hub):
+        history = wiserHistory(capacity=10)
+        history.attach(hub)
+        room = simulator.domain["Room"][0]
+        temperatures = []
+        for _ in range(3):
+            room["CalculatedTemperature"] += 5
+            temperatures.append(room["CalculatedTemperature"] / 10)
+            await hub.asyncGetHubData()
+        times, values = history.series("Room", room["id"], "temperature")
+        assert len(times) == 3
+        assert list(values) == approx(temperatures)
+        stats = history.stats("Room", room["id"], "temperature")
+        assert stats["count"] == 3
+        assert stats["min"] == approx(temperatures[0])
+        assert stats["max"] == approx(temperatures[-1])
+
+    run_hub(test)
+
+
+def test_only_capacity_samples_are_kept(run_hub):
+    async def test(simulator, hub):
+        history = wiserHistory(capacity=2)
+        history.attach(hub)
+        room = simulator.domain["Room"][0]
+        for _ in range(5):
+            room["CalculatedTemperature"] += 1
+            await hub.asyncGetHubData()
+        _, values = history.series("Room", room["id"], "temperature")
+        assert history.count == 5
+        latest = room["CalculatedTemperature"]
+        assert list(values) == approx([(latest - 1) / 10, latest / 10])
+
+    run_hub(test)
+
+
+def test_removed_rooms_have_no_samples_after_removal(run_hub):
+    async def test(simulator, hub):
+        history = wiserHistory(capacity=10)
+        history.attach(hub)
+        await hub.asyncGetHubData()
+        room = simulator.domain["Room"].pop()
+        await hub.asyncGetHubData()
+        times, _ = history.series("Room", room["id"], "temperature")
+        assert len(times) == 1
+
+    run_hub(test)
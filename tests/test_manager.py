@@ -0,0 +1,81 @@
+"""
+Tests of managing many hubs against Wiser Hub simulators.
+"""
+import asyncio
+
+import pytest
+
+from aioWiserHeatingAPI.aiowiserhub import WiserException
+from aioWiserHeatingAPI.aiowisermanager import wiserHubManager
+from aioWiserHeatingAPI.aiowisersimulator import wiserHubSimulator
+
+
+def run(test, hubs=2, **manager_options):
+    """Runs a test coroutine with a manager of hubs, each on its own simulator"""
+
+    async def main():
+        simulators = [wiserHubSimulator(rooms=3, seed=index) for index in range(hubs)]
+        for simulator in simulators:
+            await simulator.start()
+        try:
+            async with wiserHubManager(**manager_options) as manager:
+                for simulator in simulators:
+                    manager.addHub(simulator.host, simulator.apiKey)
+                await test(simulators, manager)
+        finally:
+            for simulator in simulators:
+                await simulator.stop()
+
+    asyncio.run(main())
+
+
+def test_poll_all_polls_every_hub():
+    async def test(simulators, manager):
+        assert await manager.asyncPollAll() == {simulator.host: True for simulator in simulators}
+        assert manager.failedHubs == []
+        for simulator in simulators:
+            assert len(manager.hub(simulator.host).rooms) == 3
+
+    run(test)
+
+
+def test_failing_hub_does_not_stop_the_others():
+    async def test(simulators, manager):
+        simulators[0].errorRate = 1
+        results = await manager.asyncPollAll()
+        assert results == {simulators[0].host: False, simulators[1].host: True}
+        assert manager.failedHubs == [simulators[0].host]
+        assert manager.lastError(simulators[0].host).status == "ServerError"
+        assert manager.scheduler(simulators[0].host).failures == 1
+
+    run(test, connection_limit=2)
+
+
+def test_add_hub_rejects_duplicate_hosts_and_own_sessions():
+    async def test(simulators, manager):
+        with pytest.raises(WiserException) as raised:
+            manager.addHub(simulators[0].host, simulators[0].apiKey)
+        assert raised.value.status == "HubExists"
+        with pytest.raises(WiserException) as raised:
+            manager.addHub("other", "key", session=object())
+        assert raised.value.status == "InvalidOption"
+        assert len(manager.hubs) == 2
+
+    run(test)
+
+
+def test_started_manager_polls_until_stopped():
+    async def test(simulators, manager):
+        manager.start()
+        await asyncio.sleep(0.3)
+        await manager.stop()
+        # A refresh in flight when polling stops still completes
+        await asyncio.sleep(0.1)
+        versions = [manager.hub(simulator.host).version for simulator in simulators]
+        assert all(version > 1 for version in versions)
+        await asyncio.sleep(0.1)
+        assert [manager.hub(simulator.host).version for simulator in simulators] == versions
+        await manager.removeHub(simulators[0].host)
+        assert list(manager.hubs) == [simulators[1].host]
+
+    run(test, poll_interval=0.02, min_poll_interval=0.01, max_poll_interval=0.02)
@@ -0,0 +1,63 @@
+"""
+Tests of optimistic updates after writes against the Wiser Hub simulator.
+"""
+import asyncio
+
+from helpers import room_patches
+
+
+def test_write_is_applied_before_the_next_refresh(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncSetRoomTemperature(1, 23)
+        assert hub.room(1)["CurrentSetPoint"] == 230
+        assert hub.isPending("Room", 1)
+        await hub.asyncGetHubData()
+        assert hub.room(1)["CurrentSetPoint"] == 230
+        assert not hub.isPending("Room", 1)
+
+    run_hub(test)
+
+
+def test_merged_writes_apply_only_what_was_sent(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        scheduled = hub.room(1)["ScheduledSetPoint"]
+        await asyncio.gather(hub.asyncSetRoomTemperature(1, 22), hub.asyncSetRoomMode(1, "auto"))
+        assert len(room_patches(simulator, 1)) == 1
+        assert hub.room(1)["Mode"] == "Auto"
+        assert hub.room(1)["CurrentSetPoint"] == scheduled
+        assert hub.pendingState[("Room", 1)]["CurrentSetPoint"] == scheduled
+
+    run_hub(test)
+
+
+def test_write_the_hub_did_not_apply_is_rolled_back(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        plugId = hub.smartPlugs[0]["id"]
+        await hub.asyncSetSmartPlugState(plugId, "on")
+        assert hub.smartPlug(plugId)["OutputState"] == "On"
+        # The hub ignores the write
+        plug = next(plug for plug in simulator.domain["SmartPlug"] if plug["id"] == plugId)
+        plug["ManualState"] = plug["OutputState"] = "Off"
+        await hub.asyncGetHubData()
+        assert hub.smartPlug(plugId)["OutputState"] == "Off"
+        assert hub.pendingState == {}
+
+    run_hub(test)
+
+
+def test_write_during_a_refresh_stays_pending(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        simulator.latency = 0.2
+        refresh = asyncio.ensure_future(hub.asyncGetHubData())
+        await asyncio.sleep(0.05)
+        simulator.latency = 0
+        await hub.asyncSetRoomTemperature(1, 24)
+        await refresh
+        assert hub.room(1)["CurrentSetPoint"] == 240
+        assert hub.isPending("Room", 1)
+
+    run_hub(test, write_coalesce_window=0)
@@ -0,0 +1,63 @@
+"""
+Tests of the poll log against the Wiser Hub simulator.
+"""
+from pytest import approx
+
+from aioWiserHeatingAPI.aiowiserpolllog import wiserPollLog, wiserPollLogReader
+
+
+def test_refreshes_are_read_back(run_hub, tmp_path):
+    path = str(tmp_path / "wiser.plog")
+
+    async def test(simulator, hub):
+        log = wiserPollLog(path)
+        log.attach(hub)
+        room = simulator.domain["Room"][0]
+        temperatures = []
+        for _ in range(3):
+            room["CalculatedTemperature"] += 5
+            temperatures.append(room["CalculatedTemperature"] / 10)
+            await hub.asyncGetHubData()
+
+        with wiserPollLogReader(path) as reader:
+            assert reader.hubs == [hub.host]
+            times, values = reader.series(hub.host, "Room", room["id"], "temperature")
+            assert list(values) == approx(temperatures)
+            assert list(times) == sorted(times)
+            _, modes = reader.series(hub.host, "Room", room["id"], "state")
+            assert list(modes) == [room["Mode"]] * 3
+            assert len(reader.records(entityType="Room")) == 3 * len(simulator.domain["Room"])
+
+    run_hub(test)
+
+
+def test_time_ranges_select_refreshes(run_hub, tmp_path):
+    path = str(tmp_path / "wiser.plog")
+
+    async def test(simulator, hub):
+        log = wiserPollLog(path)
+        for timestamp in [100, 200, 300]:
+            await hub.asyncGetHubData()
+            await log.record(hub.snapshot, hub.host, timestamp)
+
+        with wiserPollLogReader(path) as reader:
+            times, _ = reader.series(hub.host, "Room", 1, "temperature", start=150, end=300)
+            assert list(times) == [200, 300]
+
+    run_hub(test)
+
+
+def test_one_log_holds_many_hubs(run_hub, tmp_path):
+    path = str(tmp_path / "wiser.plog")
+
+    async def test(simulator, hub):
+        log = wiserPollLog(path)
+        await hub.asyncGetHubData()
+        await log.record(hub.snapshot, "first")
+        await log.record(hub.snapshot, "second")
+
+        with wiserPollLogReader(path) as reader:
+            assert reader.hubs == ["first", "second"]
+            assert len(reader.records(host="second")) == reader.count // 2
+
+    run_hub(test)
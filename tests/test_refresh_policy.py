@@ -0,0 +1,56 @@
+"""
+Tests of refresh policies and per-section fetches against the Wiser Hub simulator.
+"""
+from aioWiserHeatingAPI.aiowiserhub import TIERED_REFRESH_POLICY
+
+from helpers import requests
+
+
+def test_sections_not_due_keep_their_data(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        first = hub.snapshot
+        simulator.domain["Cloud"]["Environment"] = "Dev"
+        simulator.domain["Room"][0]["CalculatedTemperature"] += 5
+        await hub.asyncGetHubData()
+        assert hub.cloud["Environment"] == "Prod"
+        assert hub.rooms[0]["CalculatedTemperature"] == simulator.domain["Room"][0]["CalculatedTemperature"]
+        # Cold sections are carried over rather than indexed again
+        assert hub.snapshot.indexes["Device"] is first.indexes["Device"]
+        assert hub.snapshot.sections["Schedule"] is first.sections["Schedule"]
+        assert [change.entityType for change in hub.lastChanges] == ["Room"]
+
+        hub.invalidateSections("Cloud")
+        await hub.asyncGetHubData()
+        assert hub.cloud["Environment"] == "Dev"
+
+    run_hub(test, refresh_policy=TIERED_REFRESH_POLICY)
+
+
+def test_network_is_fetched_on_its_own_policy(run_hub):
+    async def test(simulator, hub):
+        for _ in range(3):
+            await hub.asyncGetHubData()
+        assert requests(hub) == {"GET domain/": 3, "GET network/": 1}
+
+    run_hub(test, refresh_policy=TIERED_REFRESH_POLICY)
+
+
+def test_few_due_sections_are_fetched_one_request_each(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncGetHubData()
+        assert requests(hub) == {"GET domain/Room/": 2, "GET domain/SmartPlug/": 2, "GET network/": 2}
+        assert sorted(hub.snapshot.sections) == ["Room", "SmartPlug"]
+
+    run_hub(test, sections=["Room", "SmartPlug"])
+
+
+def test_many_due_sections_take_only_those_sections_from_the_domain(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert requests(hub) == {"GET domain/": 1, "GET network/": 1}
+        assert sorted(hub.snapshot.sections) == ["HeatingChannel", "Room", "SmartPlug"]
+        assert hub.snapshot.indexes["Device"] == {}
+
+    run_hub(test, sections=["Room", "SmartPlug", "HeatingChannel"])
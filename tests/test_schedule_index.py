@@ -0,0 +1,56 @@
+"""
+Tests of the compiled schedule index against the Wiser Hub simulator.  The simulator
+schedules heat to 20C at 06:30 and drop to 16C at 08:30 on weekdays.
+"""
+import datetime
+
+MONDAY = datetime.datetime(2026, 10, 12)
+
+
+def test_scheduled_set_point_at_a_time(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert hub.roomScheduledSetPoint(1, MONDAY.replace(hour=7)) == 20
+        assert hub.roomScheduledSetPoint(1, MONDAY.replace(hour=9)) == 16
+        assert hub.roomScheduledSetPoint(99, MONDAY) is None
+
+    run_hub(test)
+
+
+def test_next_change_wraps_past_the_end_of_the_week(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert hub.roomNextScheduleChange(1, MONDAY.replace(hour=7)) == (
+            MONDAY.replace(hour=8, minute=30), 16
+        )
+        sunday = MONDAY + datetime.timedelta(days=6, hours=23, minutes=30)
+        assert hub.roomNextScheduleChange(1, sunday) == (
+            MONDAY + datetime.timedelta(days=7, hours=6, minutes=30), 20
+        )
+
+    run_hub(test)
+
+
+def test_rooms_changing_within_a_window(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        changes = hub.roomsChangingWithin(60, MONDAY.replace(hour=6))
+        roomIds = [room["id"] for room in simulator.domain["Room"]]
+        assert sorted(change["roomId"] for change in changes) == roomIds
+        assert {(change["time"], change["setPoint"]) for change in changes} == {
+            (MONDAY.replace(hour=6, minute=30), 20)
+        }
+        assert hub.roomsChangingWithin(30, MONDAY.replace(hour=7)) == []
+
+    run_hub(test)
+
+
+def test_index_follows_schedule_writes(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncSetRoomSchedule(1, {"Monday": {"SetPoints": [{"Time": 700, "DegreesC": 190}]}})
+        await hub.asyncGetHubData()
+        assert hub.roomScheduledSetPoint(1, MONDAY.replace(hour=12)) == 19
+        assert hub.roomScheduledSetPoint(3, MONDAY.replace(hour=12)) == 16
+
+    run_hub(test)
@@ -0,0 +1,61 @@
+"""
+Tests of the adaptive poll scheduler against the Wiser Hub simulator.
+"""
+import asyncio
+
+import pytest
+
+from aioWiserHeatingAPI.aiowiserhub import WiserException
+from aioWiserHeatingAPI.aiowiserscheduler import wiserPollScheduler
+
+
+def test_polls_slow_down_while_nothing_changes(run_hub):
+    async def test(simulator, hub):
+        scheduler = wiserPollScheduler(interval=10, min_interval=5, max_interval=20)
+        assert await scheduler.asyncPoll(hub)
+        assert scheduler.interval == 5
+        await scheduler.asyncPoll(hub)
+        assert scheduler.interval == 7.5
+        simulator.drift(1)
+        await scheduler.asyncPoll(hub)
+        assert scheduler.interval == 5
+
+    run_hub(test)
+
+
+@pytest.mark.parametrize("status, failures", [(500, 1), (401, 0)])
+def test_only_errors_from_a_down_hub_back_off(run_hub, status, failures):
+    async def test(simulator, hub):
+        scheduler = wiserPollScheduler()
+        simulator.errorRate = 1
+        simulator.errorStatus = status
+        with pytest.raises(WiserException):
+            await scheduler.asyncPoll(hub)
+        assert scheduler.failures == failures
+
+    run_hub(test, retries=0)
+
+
+def test_open_breaker_backs_off(run_hub):
+    async def test(simulator, hub):
+        scheduler = wiserPollScheduler()
+        simulator.errorRate = 1
+        for status in ["ServerError", "HubUnavailable"]:
+            with pytest.raises(WiserException) as raised:
+                await scheduler.asyncPoll(hub)
+            assert raised.value.status == status
+        assert scheduler.failures == 2
+
+    run_hub(test, retries=0, breaker_threshold=1, breaker_probe_interval=60)
+
+
+def test_run_polls_until_cancelled(run_hub):
+    async def test(simulator, hub):
+        scheduler = wiserPollScheduler(interval=0.02, min_interval=0.01, max_interval=0.02)
+        task = asyncio.ensure_future(scheduler.run(hub))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert hub.version > 2
+
+    run_hub(test)
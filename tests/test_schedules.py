@@ -0,0 +1,60 @@
+"""
+Tests of setting schedules against the Wiser Hub simulator.
+"""
+from aioWiserHeatingAPI.aiowiserschedule import validateSchedule
+
+MONDAY = {"SetPoints": [{"Time": 700, "DegreesC": 190}]}
+
+
+def hub_schedule(simulator, scheduleId):
+    return next(schedule for schedule in simulator.domain["Schedule"] if schedule["id"] == scheduleId)
+
+
+def test_schedule_patch_keeps_days_it_leaves_out(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        tuesday = hub.schedule(1)["Tuesday"]
+        assert await hub.asyncSetRoomSchedules({1: {"Monday": MONDAY}}) == {1: True}
+        assert hub_schedule(simulator, 1)["Monday"] == MONDAY
+        assert hub_schedule(simulator, 1)["Tuesday"] == tuesday
+        await hub.asyncGetHubData()
+        assert await hub.asyncSetRoomSchedules({1: {"Monday": MONDAY}}) == {1: False}
+
+    run_hub(test)
+
+
+def test_read_only_schedule_keys_are_not_sent(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        scheduleData = dict(
+            hub.schedule(3), Monday=MONDAY, CurrentSetpoint=190, NextEventTime=420, NextEventSetpoint=160
+        )
+        assert validateSchedule(scheduleData) == []
+        assert await hub.asyncSetRoomSchedules({1: scheduleData}) == {1: True}
+        (path, payload), = simulator.patches
+        assert path == "/data/domain/Schedule/1"
+        assert set(payload) == {
+            "Type", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"
+        }
+
+    run_hub(test)
+
+
+def test_invalid_weekdays_are_reported():
+    problems = validateSchedule({"Monday": {"SetPoints": [{"Time": 2500, "DegreesC": 190}]}, "Tuesday": {}})
+    assert problems == ["Monday has an invalid Time 2500", "Tuesday must have a SetPoints list"]
+
+
+def test_schedules_for_the_same_room_are_all_rejected(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        name = hub.room(1)["Name"]
+        results = await hub.asyncSetRoomSchedules(
+            {1: {"Monday": MONDAY}, name: {"Monday": MONDAY}, 3: {"Monday": MONDAY}}
+        )
+        assert results[1].status == "DuplicateRoom"
+        assert results[name].status == "DuplicateRoom"
+        assert results[3] is True
+        assert [path for path, _ in simulator.patches] == ["/data/domain/Schedule/3"]
+
+    run_hub(test)
@@ -0,0 +1,55 @@
+"""
+Tests of limiting a hub to some domain sections against the Wiser Hub simulator.
+"""
+from helpers import requests
+
+
+def test_reading_a_section_adds_it_to_refreshes(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert not hub.devices
+        await hub.asyncGetHubData()
+        assert hub.activeSections == ["Device", "Room"]
+        assert hub.devices == simulator.domain["Device"]
+
+    run_hub(test, sections=["Room"])
+
+
+def test_load_sections_fetches_them_straight_away(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncLoadSections("System")
+        assert hub.system == simulator.domain["System"]
+        assert hub.activeSections == ["Room", "System"]
+
+    run_hub(test, sections=["Room"])
+
+
+def test_helpers_do_not_add_sections(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert hub.homeAwayMode == "HOME"
+        assert hub.deviceRoom(1) is None
+        assert hub.relayNodes == {}
+        assert hub.roomScheduledSetPoint(1) is None
+        await hub.asyncGetHubData()
+        assert hub.activeSections == ["Room", "SmartPlug"]
+        assert requests(hub) == {"GET domain/Room/": 2, "GET domain/SmartPlug/": 2, "GET network/": 2}
+
+    run_hub(test, sections=["Room", "SmartPlug"])
+
+
+def test_set_functions_fetch_sections_once_without_adding_them(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert await hub.asyncSetHomeAwayMode("AWAY")
+        assert await hub.asyncSetHotwaterMode("on")
+        assert await hub.asyncSetHotwaterMode("off")
+        await hub.asyncGetHubData()
+        assert hub.activeSections == ["Room"]
+        assert hub.pendingState == {}
+        counts = requests(hub)
+        assert counts["GET domain/HotWater/"] == 1
+        assert counts["GET domain/Room/"] == 2
+
+    run_hub(test, sections=["Room"])
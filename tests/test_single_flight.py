@@ -0,0 +1,38 @@
+"""
+Tests of single flight refreshes against the Wiser Hub simulator.
+"""
+import asyncio
+
+
+def test_concurrent_refreshes_share_one_set_of_requests(run_hub):
+    async def test(simulator, hub):
+        results = await asyncio.gather(*[hub.asyncGetHubData() for _ in range(5)])
+        assert results == [True] * 5
+        # One domain and one network request
+        assert simulator.requestCount == 2
+        assert hub.version == 1
+
+    run_hub(test)
+
+
+def test_cancelled_caller_does_not_cancel_the_refresh(run_hub):
+    async def test(simulator, hub):
+        simulator.latency = 0.1
+        first = asyncio.ensure_future(hub.asyncGetHubData())
+        second = asyncio.ensure_future(hub.asyncGetHubData())
+        await asyncio.sleep(0.02)
+        first.cancel()
+        assert await second
+        assert first.cancelled()
+        assert simulator.requestCount == 2
+
+    run_hub(test)
+
+
+def test_max_age_uses_recent_data(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncGetHubData(max_age=60)
+        assert simulator.requestCount == 2
+
+    run_hub(test)
@@ -0,0 +1,45 @@
+"""
+Tests of skipping unchanged hub responses against the Wiser Hub simulator.
+"""
+
+
+def test_unchanged_refresh_reuses_the_snapshot_data(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        first = hub.snapshot
+        await hub.asyncGetHubData()
+        assert hub.lastRefreshUnchanged
+        assert hub.lastChanges == []
+        assert hub.version == first.version + 1
+        assert hub.snapshot.sections is first.sections
+        assert hub.snapshot.indexes is first.indexes
+        assert hub.stats.unchangedRefreshes == 1
+        assert hub.stats.endpoints["GET domain/"].unchanged == 1
+
+    run_hub(test)
+
+
+def test_changed_refresh_is_not_skipped(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        simulator.domain["Room"][0]["CalculatedTemperature"] += 5
+        await hub.asyncGetHubData()
+        assert not hub.lastRefreshUnchanged
+        assert hub.stats.unchangedRefreshes == 0
+        assert hub.stats.endpoints["GET network/"].unchanged == 1
+        assert hub.room(1)["CalculatedTemperature"] == simulator.domain["Room"][0]["CalculatedTemperature"]
+
+    run_hub(test)
+
+
+def test_unchanged_sections_keep_their_data(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        devices = hub.snapshot.sections["Device"]
+        simulator.domain["Room"][0]["CalculatedTemperature"] += 5
+        await hub.asyncGetHubData()
+        assert not hub.lastRefreshUnchanged
+        assert hub.snapshot.sections["Device"] is devices
+        assert [change.entityType for change in hub.lastChanges] == ["Room"]
+
+    run_hub(test, sections=["Room", "Device"])
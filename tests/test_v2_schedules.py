@@ -0,0 +1,54 @@
+"""
+Tests of fetching schedules from the v2 schedules api against the Wiser Hub simulator.
+"""
+import copy
+
+from helpers import requests
+
+
+def test_schedules_are_fetched_from_v2_on_their_own_policy(run_hub):
+    async def test(simulator, hub):
+        expected = copy.deepcopy(simulator.domain["Schedule"])
+        for _ in range(3):
+            await hub.asyncGetHubData()
+        assert requests(hub) == {"GET domain/": 3, "GET v2/schedules/": 1, "GET network/": 3}
+        assert hub.schedules == expected
+
+    run_hub(test, api_version=2)
+
+
+def test_schedules_in_the_domain_data_are_ignored(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        schedules = hub.snapshot.sections["Schedule"]
+        simulator.domain["Schedule"][0]["Monday"] = {"SetPoints": [{"Time": 700, "DegreesC": 190}]}
+        await hub.asyncGetHubData()
+        assert hub.snapshot.sections["Schedule"] is schedules
+
+    run_hub(test, api_version=2)
+
+
+def test_schedule_write_fetches_v2_schedules_again(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        monday = {"SetPoints": [{"Time": 700, "DegreesC": 190}]}
+        await hub.asyncSetRoomSchedule(1, {"Monday": monday})
+        await hub.asyncGetHubData()
+        assert requests(hub)["GET v2/schedules/"] == 2
+        assert hub.schedule(1)["Monday"] == monday
+        assert not hub.isPending("Schedule", 1)
+
+    run_hub(test, api_version=2)
+
+
+def test_hub_without_v2_uses_domain_schedules(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        assert hub.schedules == {}
+        await hub.asyncGetHubData()
+        assert hub.schedules == simulator.domain["Schedule"]
+        assert "Schedule" not in hub.refreshPolicy
+        await hub.asyncGetHubData()
+        assert requests(hub)["GET v2/schedules/"] == 1
+
+    run_hub(test, api_version=2, simulator_options={"v2_api": False})
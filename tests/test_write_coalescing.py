@@ -0,0 +1,74 @@
+"""
+Tests of write coalescing against the Wiser Hub simulator.
+"""
+import asyncio
+
+import pytest
+
+from helpers import room_patches
+
+
+def test_writes_to_one_path_are_merged(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        results = await asyncio.gather(
+            hub.asyncSetRoomTemperature(1, 21), hub.asyncSetRoomTemperature(1, 22)
+        )
+        assert results == [True, True]
+        assert room_patches(simulator, 1) == [
+            {"RequestOverride": {"Type": "Manual", "SetPoint": 220}}
+        ]
+
+    run_hub(test)
+
+
+def test_writes_to_different_paths_are_not_merged(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await asyncio.gather(hub.asyncSetRoomTemperature(1, 21), hub.asyncSetRoomTemperature(3, 22))
+        assert len(simulator.patches) == 2
+
+    run_hub(test)
+
+
+def test_off_mode_cancels_boost_in_its_own_request(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncSetRoomMode(1, "off")
+        patches = room_patches(simulator, 1)
+        assert len(patches) == 2
+        assert patches[0]["RequestOverride"]["Type"] == "None"
+        assert patches[1]["RequestOverride"] == {"Type": "Manual", "SetPoint": -200}
+
+    run_hub(test)
+
+
+def test_auto_mode_cancels_boost_in_one_request(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        await hub.asyncSetRoomMode(1, "auto")
+        patches = room_patches(simulator, 1)
+        assert len(patches) == 1
+        assert patches[0]["Mode"] == "Auto"
+        assert patches[0]["RequestOverride"]["Type"] == "None"
+
+    run_hub(test)
+
+
+def test_cancelled_flush_cancels_waiting_writers(run_hub):
+    async def test(simulator, hub):
+        await hub.asyncGetHubData()
+        write = asyncio.ensure_future(hub.asyncSetRoomTemperature(1, 21))
+        await asyncio.sleep(0.01)
+        (flush,) = [
+            task for task in asyncio.all_tasks()
+            if task.get_coro().__qualname__ == "wiserHub._flushWrite"
+        ]
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(write, 1)
+        # A later write to the path is not merged into the cancelled one
+        assert await asyncio.wait_for(hub.asyncSetRoomTemperature(1, 21), 1)
+        assert len(room_patches(simulator, 1)) == 1
+
+    run_hub(test)